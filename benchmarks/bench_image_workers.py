@@ -0,0 +1,124 @@
+"""Event loop responsiveness while page images are being rendered.
+
+Fires a burst of concurrent page renders, the decode, scale and JPEG encode done
+for every ``/api/chapter/<id>/page/<index>`` request, once inline on the event
+loop like the handlers used to and once through the ``WorkerPool``. A timer
+ticking every millisecond measures how long the loop is stalled, which is how
+long every other connection waits. Run from the repository root with
+``python benchmarks/bench_image_workers.py [concurrency]``.
+"""
+
+from __future__ import annotations
+
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "yomuserver")
+sys.path.insert(0, os.path.join(ROOT, "dependencies"))
+sys.path.insert(0, os.path.join(ROOT, "routes"))
+
+from PyQt6.QtCore import QBuffer, QEventLoop, QTimer  # noqa: E402
+from PyQt6.QtGui import QColor, QGuiApplication, QImage, QPainter  # noqa: E402
+
+from qhttpserver.worker import WorkerPool  # noqa: E402
+from images import render_image  # noqa: E402
+
+
+def make_page(width: int = 1600, height: int = 2400) -> bytes:
+    # Noise compresses badly, so the page is about as expensive as a real scan
+    image = QImage(width, height, QImage.Format.Format_RGB32)
+    image.fill(QColor("white"))
+    painter = QPainter(image)
+    data = os.urandom(width * height // 64)
+    for i in range(0, len(data) - 2, 3):
+        painter.setPen(QColor(data[i], data[i + 1], data[i + 2]))
+        painter.drawPoint((i * 7) % width, (i * 13) % height)
+    painter.end()
+
+    buffer = QBuffer()
+    buffer.open(QBuffer.OpenModeFlag.WriteOnly)
+    image.save(buffer, "PNG")
+    return buffer.data().data()
+
+
+class StallMeter:
+    def __init__(self) -> None:
+        self.timer = QTimer()
+        self.timer.setInterval(1)
+        self.timer.timeout.connect(self._tick)
+        self.max_stall = 0.0
+        self._last = 0.0
+
+    def start(self) -> None:
+        self.max_stall = 0.0
+        self._last = time.perf_counter()
+        self.timer.start()
+
+    def stop(self) -> None:
+        self.timer.stop()
+        self._tick()
+
+    def _tick(self) -> None:
+        now = time.perf_counter()
+        self.max_stall = max(self.max_stall, now - self._last)
+        self._last = now
+
+
+def run(page: bytes, concurrency: int, pool: WorkerPool | None) -> tuple:
+    meter = StallMeter()
+    loop = QEventLoop()
+    latencies: list[float] = []
+    started = time.perf_counter()
+
+    def done(_=None) -> None:
+        latencies.append(time.perf_counter() - started)
+        if len(latencies) == concurrency:
+            loop.quit()
+
+    def fire() -> None:
+        for _ in range(concurrency):
+            if pool is None:
+                # Each request's handler runs to completion before the next one
+                QTimer.singleShot(0, lambda: done(render_image(page)))
+            else:
+                task = pool.create(render_image, page)
+                task.finished.connect(done)
+                task.start()
+
+    meter.start()
+    QTimer.singleShot(0, fire)
+    loop.exec()
+    meter.stop()
+    return latencies, meter.max_stall
+
+
+def main() -> None:
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    app = QGuiApplication(sys.argv)  # noqa: F841
+
+    page = make_page()
+    pool = WorkerPool()
+    print(
+        f"{concurrency} concurrent renders of a {len(page) / 1024:.0f} KiB page, "
+        f"{pool.max_workers} worker threads\n"
+    )
+    print(f"{'mode':<10}{'p50':>10}{'p95':>10}{'total':>10}{'max stall':>12}")
+
+    for name, p in (("inline", None), ("pool", pool)):
+        latencies, stall = run(page, concurrency, p)
+        latencies.sort()
+        p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+        print(
+            f"{name:<10}{statistics.median(latencies) * 1e3:>8.1f}ms"
+            f"{p95 * 1e3:>8.1f}ms{latencies[-1] * 1e3:>8.1f}ms{stall * 1e3:>10.1f}ms"
+        )
+
+    pool.wait_for_done()
+
+
+if __name__ == "__main__":
+    main()
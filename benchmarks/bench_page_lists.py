@@ -0,0 +1,130 @@
+"""Query plans and timings for the stored page lists.
+
+Every statement the ``ChapterHandler`` runs against ``pages`` and
+``page_lists`` is read straight out of ``yomuserver/routes/chapters.py`` and run
+on an in-memory SQLite database filled with a large library. The plan of each
+one is printed so a full table scan stands out, and each is timed once against
+the real tables and once against ``pages`` without its primary key, which is
+the index that serves the lookups by ``chapter_id``. Run from the repository
+root with ``python benchmarks/bench_page_lists.py [chapters] [pages]``.
+"""
+
+from __future__ import annotations
+
+import ast
+import os
+import sqlite3
+import sys
+import time
+import timeit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "yomuserver")
+SOURCE = os.path.join(ROOT, "routes", "chapters.py")
+
+STATEMENTS = ("CREATE", "SELECT", "INSERT", "UPDATE", "DELETE")
+
+
+def collect_statements() -> list[str]:
+    with open(SOURCE) as f:
+        tree = ast.parse(f.read())
+
+    statements = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Constant) or not isinstance(node.value, str):
+            continue
+        statement = " ".join(node.value.split())
+        if statement.startswith(STATEMENTS) and (
+            " pages " in statement or " page_lists" in statement
+        ):
+            statements.append(statement)
+    return statements
+
+
+def create_database(
+    tables: list[str], chapters: int, pages: int, indexed: bool
+) -> sqlite3.Connection:
+    db = sqlite3.connect(":memory:")
+    db.execute("PRAGMA foreign_keys = ON")
+    db.execute("CREATE TABLE chapters (id INTEGER PRIMARY KEY)")
+    for table in tables:
+        if not indexed:
+            table = table.replace("PRIMARY KEY(chapter_id, number),", "")
+        db.execute(table)
+
+    now = int(time.time())
+    db.executemany("INSERT INTO chapters VALUES (?)", ((i,) for i in range(chapters)))
+    db.executemany(
+        "INSERT INTO pages VALUES (?, ?, ?)",
+        (
+            (chapter, page, f"https://example.org/{chapter}/{page}.png")
+            for chapter in range(chapters)
+            for page in range(pages)
+        ),
+    )
+    db.executemany(
+        "INSERT INTO page_lists VALUES (?, ?, ?)",
+        ((chapter, pages, now) for chapter in range(chapters)),
+    )
+    db.commit()
+    return db
+
+
+def parameters(chapters: int, pages: int) -> dict:
+    chapter = chapters // 2
+    return {
+        "chapter_id": chapter,
+        "number": pages // 2,
+        "count": pages,
+        "fetched_after": int(time.time()) - 60,
+        "page_count": pages,
+        "fetched_at": int(time.time()),
+        "url": f"https://example.org/{chapter}/0.png",
+    }
+
+
+def main() -> None:
+    chapters = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    pages = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+
+    statements = collect_statements()
+    tables = [s for s in statements if s.startswith("CREATE")]
+    queries = [s for s in statements if not s.startswith("CREATE")]
+
+    databases = {
+        indexed: create_database(tables, chapters, pages, indexed)
+        for indexed in (False, True)
+    }
+    params = parameters(chapters, pages)
+
+    print(f"{chapters} chapters, {chapters * pages} stored pages\n")
+    for query in queries:
+        print(query)
+        times = []
+        for indexed, db in databases.items():
+            label = "primary key" if indexed else "no index"
+            try:
+                plan = db.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+            except sqlite3.OperationalError as e:
+                # e.g. an upsert needs the key to conflict on
+                print(f"  {label:<12} {e}")
+                times.append(f"{'-':>12}")
+                continue
+            print(f"  {label:<12} " + "; ".join(row[-1] for row in plan))
+
+            db.execute("SAVEPOINT bench")
+            number = 200
+            best = min(
+                timeit.repeat(
+                    lambda: db.execute(query, params).fetchall(),
+                    number=number,
+                    repeat=3,
+                )
+            )
+            db.execute("ROLLBACK TO bench")
+            db.execute("RELEASE bench")
+            times.append(f"{best / number * 1e6:>10.2f}us")
+        print(f"  {'time':<12} " + "  ".join(times) + "\n")
+
+
+if __name__ == "__main__":
+    main()
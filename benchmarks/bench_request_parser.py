@@ -0,0 +1,115 @@
+"""Compare the incremental RequestParser with the original one-shot parser.
+
+Run from the repository root with ``python benchmarks/bench_request_parser.py``.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import timeit
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), "..", "yomuserver", "dependencies")
+)
+
+from qhttpserver.parser import RequestParser  # noqa: E402
+from qhttpserver.request import HttpRequest, Method  # noqa: E402
+
+SEGMENT_SIZE = 1460
+
+
+def legacy_from_raw_data(data: bytes) -> HttpRequest | None:
+    # HttpRequest.from_raw_data as it was before the incremental parser
+    request = data.decode()
+    if not (lines := request.split("\r\n")):
+        return None
+    http_info = lines[0].split(" ")
+
+    method = Method.get_method(http_info[0])
+    if method is None:
+        return None
+
+    parsed_url_path = urlparse(http_info[1])
+    path = parsed_url_path.path
+    query_params = parse_qs(parsed_url_path.query)
+
+    version = float(http_info[2].split("/")[1])
+
+    headers = {}
+    for i, line in enumerate(lines[1:], start=1):
+        if not line:
+            break
+
+        key, value = line.split(": ")
+        headers[key] = value
+    else:
+        i += 1
+
+    body = "\n".join(lines[i:]) if i < len(lines) else None
+    return HttpRequest(method, version, path, headers, body, query_params)
+
+
+def build_request(method: str, path: str, body: bytes = b"") -> bytes:
+    head = (
+        f"{method} {path} HTTP/1.1\r\n"
+        "Host: 192.168.1.10:6969\r\n"
+        "User-Agent: Mozilla/5.0 (Linux; Android 14) Mobile Safari/537.36\r\n"
+        "Accept: */*\r\n"
+        "Accept-Encoding: gzip, deflate\r\n"
+        "Connection: keep-alive\r\n"
+    )
+    if body:
+        head += f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+    return f"{head}\r\n".encode() + body
+
+
+def parse_whole(data: bytes) -> HttpRequest:
+    parser = RequestParser()
+    parser.feed(data)
+    return parser.next_request()
+
+
+def parse_segments(data: bytes) -> HttpRequest:
+    parser = RequestParser()
+    for i in range(0, len(data), SEGMENT_SIZE):
+        parser.feed(data[i : i + SEGMENT_SIZE])
+        if (request := parser.next_request()) is not None:
+            return request
+
+
+def main() -> None:
+    filters = [
+        {"key": f"genre-{i}", "type": "LIST", "value": [f"value-{j}" for j in range(8)]}
+        for i in range(400)
+    ]
+    cases = {
+        "GET /api/library": build_request("GET", "/api/library/"),
+        "GET page image": build_request("GET", "/api/chapter/1234/page/12?width=720"),
+        "POST 100 KB filters": build_request(
+            "POST", "/api/sources/3/filters", json.dumps(filters).encode()
+        ),
+        "POST 1 MB body": build_request("POST", "/api/sources/3/filters", b"x" * 2**20),
+    }
+
+    print(f"{'case':<24}{'legacy':>14}{'incremental':>14}{'segmented':>14}")
+    for name, data in cases.items():
+        number = 2000 if len(data) < 4096 else 50
+        results = [
+            min(timeit.repeat(lambda: func(data), number=number, repeat=5)) / number
+            for func in (legacy_from_raw_data, parse_whole, parse_segments)
+        ]
+        print(
+            f"{name:<24}" + "".join(f"{result * 1e6:>12.1f}us" for result in results)
+        )
+
+    print(
+        "\nsegmented = the same request fed in 1460 byte TCP segments, which the "
+        "legacy parser can't handle at all"
+    )
+
+
+if __name__ == "__main__":
+    main()
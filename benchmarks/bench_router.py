@@ -0,0 +1,167 @@
+"""Dispatch microbenchmark for every route Yomu-Server registers.
+
+Compares the segment trie Router with the linear regex scan it replaced. Routes
+are read straight out of ``yomuserver/routes`` so the benchmark follows the
+real route table. Run from the repository root with
+``python benchmarks/bench_router.py``.
+"""
+
+from __future__ import annotations
+
+import ast
+import os
+import re
+import sys
+import timeit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "yomuserver")
+sys.path.insert(0, os.path.join(ROOT, "dependencies"))
+
+from qhttpserver.request import Method  # noqa: E402
+from qhttpserver.router import Router  # noqa: E402
+
+MATCH = re.compile(r"<([a-zA-Z_]+):?([a-zA-Z]+)?>")
+TYPES = {"int": (r"(\d+)", int), "float": (r"(\d+\.\d+)", float)}
+SAMPLES = {"int": "1234", "float": "12.5", None: "index-D9SNt-lT.js"}
+
+# Registered outside of a RouteHandler in yomuserver/http.py
+EXTRA_ROUTES = [(Method.GET, "/api/sse")]
+
+
+def legacy_check_regex(path: str) -> tuple[bool, str, dict]:
+    params = {}
+    new_path = path
+
+    offset = 0
+    for m in MATCH.finditer(path):
+        name, group_type = m.groups()
+        pattern, cls = TYPES.get(group_type, (r"([\w_.-]+)", str))
+        params[name] = cls
+
+        start, end = m.start(), m.end()
+        new_path = new_path[: start + offset] + pattern + new_path[end + offset :]
+
+        offset += len(pattern) - len(path[start:end])
+
+    new_path += r"?" if new_path.endswith("/") else "/?"
+    new_path = f"^{new_path}$"
+
+    return bool(params), new_path, params
+
+
+class LegacyRoute:
+    def __init__(self, method: Method, path: str) -> None:
+        self.has_path_params, self.path, self._params_converter = legacy_check_regex(
+            path
+        )
+        self.methods = {method: None}
+
+    def matches(self, path: str) -> bool:
+        return bool(re.match(self.path, path))
+
+    def get_params(self, path: str) -> dict:
+        m = re.search(self.path, path)
+        if m is None:
+            return {}
+
+        return {
+            name: cls(group)
+            for group, (name, cls) in zip(m.groups(), self._params_converter.items())
+        }
+
+
+class LegacyRouter:
+    def __init__(self) -> None:
+        self._paths: list[LegacyRoute] = []
+
+    def add_route(self, method: Method, path: str) -> None:
+        route = LegacyRoute(method, path)
+        for other in self._paths:
+            if other.path == route.path:
+                other.methods.update(**route.methods)
+                break
+        else:
+            self._paths.append(route)
+
+    def match(self, path: str):
+        for route in self._paths:
+            if route.matches(path):
+                params = route.get_params(path) if route.has_path_params else {}
+                return route, params
+
+
+def collect_routes() -> list[tuple[Method, str]]:
+    routes = []
+    for directory, _, files in os.walk(os.path.join(ROOT, "routes")):
+        for file in sorted(files):
+            if not file.endswith(".py"):
+                continue
+
+            with open(os.path.join(directory, file)) as f:
+                tree = ast.parse(f.read())
+
+            for cls in (node for node in tree.body if isinstance(node, ast.ClassDef)):
+                base_path = next(
+                    (
+                        node.value.value
+                        for node in cls.body
+                        if isinstance(node, ast.Assign)
+                        and node.targets[0].id == "BASE_PATH"
+                    ),
+                    None,
+                )
+                if base_path is None:
+                    continue
+
+                for func in cls.body:
+                    if not isinstance(func, ast.FunctionDef):
+                        continue
+                    for decorator in func.decorator_list:
+                        if (
+                            isinstance(decorator, ast.Call)
+                            and isinstance(decorator.func, ast.Name)
+                            and decorator.func.id in ("get", "post", "put", "delete")
+                        ):
+                            method = Method(decorator.func.id.upper())
+                            path = decorator.args[0].value
+                            routes.append((method, f"{base_path}{path}"))
+
+    return routes + EXTRA_ROUTES
+
+
+def sample_path(template: str) -> str:
+    return MATCH.sub(lambda m: SAMPLES.get(m.group(2), SAMPLES[None]), template)
+
+
+def main() -> None:
+    routes = collect_routes()
+
+    # Catch-all routes were registered last so they didn't shadow the API
+    routes.sort(key=lambda route: route[1].count("<file>"))
+
+    legacy, router = LegacyRouter(), Router()
+    for method, path in routes:
+        legacy.add_route(method, path)
+        router.add_route(method, path, lambda request: None)
+
+    paths = sorted({sample_path(path) for _, path in routes})
+    paths.append("/api/does/not/exist")
+
+    print(f"{len(routes)} routes, {len(paths)} request paths\n")
+    print(f"{'path':<44}{'linear':>12}{'trie':>12}")
+
+    number = 5000
+    totals = [0.0, 0.0]
+    for path in paths:
+        results = [
+            min(timeit.repeat(lambda: r.match(path), number=number, repeat=5)) / number
+            for r in (legacy, router)
+        ]
+        totals = [total + result for total, result in zip(totals, results)]
+        print(f"{path:<44}" + "".join(f"{result * 1e6:>10.2f}us" for result in results))
+
+    print(f"{'mean':<44}" + "".join(f"{t / len(paths) * 1e6:>10.2f}us" for t in totals))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Fan-out cost of one event sent to every open ``/api/sse`` stream.
+
+Opens a number of event streams against in-memory clients and publishes a
+library update to all of them. It is done once the way the server used to,
+with a handler per stream that encoded and wrote the event itself, and once
+through the ``SSEHub`` that encodes the event once and writes the same bytes to
+every subscriber. Also checks that disconnected subscribers leave the hub. Run
+from the repository root with ``python benchmarks/bench_sse_fanout.py
+[subscribers]``.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "yomuserver")
+sys.path.insert(0, os.path.join(ROOT, "dependencies"))
+
+from PyQt6.QtCore import pyqtSignal, QCoreApplication, QObject  # noqa: E402
+
+from qhttpserver.request import HttpRequest, Method  # noqa: E402
+from qhttpserver.sse import SSEHub, SSEResponse, SSEResponseHandler  # noqa: E402
+
+MANGA = {
+    "id": 1234,
+    "source": 7,
+    "title": "A manga with a reasonably long title",
+    "description": "Lorem ipsum dolor sit amet. " * 20,
+    "author": "Someone",
+    "artist": "Someone else",
+    "thumbnail": "https://example.org/thumbnails/1234.jpg",
+    "library": True,
+    "initialized": True,
+    "url": "https://example.org/manga/1234",
+}
+
+
+class Client(QObject):
+    # Stands in for the QTcpSocket, only keeps count of what was written
+    disconnected = pyqtSignal()
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.written = 0
+
+    def write(self, data: bytes) -> int:
+        self.written += len(data)
+        return len(data)
+
+    def flush(self) -> bool:
+        return True
+
+    def bytesToWrite(self) -> int:
+        return 0
+
+    def abort(self) -> None:
+        self.disconnected.emit()
+
+    def disconnectFromHost(self) -> None:
+        self.disconnected.emit()
+
+
+class LegacyEventHandler(SSEResponse):
+    # Every stream had its own handler that encoded every event again
+    def send_message(self, data: dict) -> None:
+        self.event_occurred.emit("message", json.dumps(data))
+
+
+def open_streams(count: int, hub: SSEHub | None) -> list[SSEResponseHandler]:
+    request = HttpRequest(Method.GET, 1.1, "/api/sse", {}, None, {})
+    handlers = []
+    for _ in range(count):
+        response = hub.subscribe() if hub is not None else LegacyEventHandler()
+        handlers.append(SSEResponseHandler(None, Client(), request, response))
+    return handlers
+
+
+def measure(publish, repeat: int = 50) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        publish()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    app = QCoreApplication(sys.argv)  # noqa: F841
+
+    message = {"type": "LIBRARY_ADD", "data": MANGA}
+
+    legacy = open_streams(count, None)
+
+    def publish_legacy() -> None:
+        for handler in legacy:
+            handler.response.send_message(message)
+
+    hub = SSEHub()
+    streams = open_streams(count, hub)
+
+    def publish_hub() -> None:
+        hub.publish("message", json.dumps(message))
+
+    results = {
+        "per handler": measure(publish_legacy),
+        "hub": measure(publish_hub),
+    }
+
+    print(f"{count} subscribers, {len(json.dumps(message))} byte event\n")
+    for name, result in results.items():
+        print(f"{name:<12}{result * 1e3:>10.2f}ms{result / count * 1e6:>10.2f}us/sub")
+
+    for handler in streams:
+        handler.client.disconnectFromHost()
+    print(f"\nsubscribers left after disconnecting: {len(hub)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import Any, Callable, Hashable, TYPE_CHECKING
+import json
+import os
+import tempfile
+import time
+
+from PyQt6.QtCore import QObject, QTimer
+
+if TYPE_CHECKING:
+    from yomu.core.app import YomuApp
+    from yomu.core.models import Category, Chapter, Manga
+
+INDEX_FILE = "index.json"
+INDEX_VERSION = 2
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    # Readers either see the old file or the whole new one, never a partial write
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class PageCache(QObject):
+    # Rendered page images stored on disk under a hash of what was rendered.
+    # The index keeps entries in least to most recently used order and is
+    # written shortly after it changes, anything on disk it doesn't know about
+    # is removed on startup
+
+    def __init__(self, root: str, max_size: int, parent: QObject | None = None):
+        super().__init__(parent)
+        self.root = root
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+        # name -> (size, chapter id, page index)
+        self._entries: OrderedDict[str, tuple[int, int, int]] = OrderedDict()
+
+        self._save_timer = QTimer(self)
+        self._save_timer.setSingleShot(True)
+        self._save_timer.setInterval(5000)
+        self._save_timer.timeout.connect(self.save)
+
+        os.makedirs(root, exist_ok=True)
+        self._load()
+
+    @staticmethod
+    def key(chapter_id: int, index: int, params: str) -> str:
+        return blake2b(
+            f"{chapter_id}:{index}:{params}".encode(), digest_size=16
+        ).hexdigest()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name[:2], name)
+
+    def _load(self) -> None:
+        try:
+            with open(os.path.join(self.root, INDEX_FILE)) as f:
+                index = json.load(f)
+            if index.get("version") != INDEX_VERSION:
+                raise ValueError
+            entries = index["entries"]
+        except (OSError, ValueError, KeyError, TypeError):
+            entries = []
+
+        for entry in entries:
+            try:
+                name, size, chapter_id, index = entry
+                if os.path.getsize(self._path(name)) != size:
+                    continue
+            except (OSError, ValueError, TypeError):
+                continue
+            self._entries[name] = (size, chapter_id, index)
+            self.size += size
+
+        for directory, _, files in os.walk(self.root):
+            for file in files:
+                if file in self._entries:
+                    continue
+                if directory == self.root and not file.endswith(".tmp"):
+                    continue
+                try:
+                    os.remove(os.path.join(directory, file))
+                except OSError:
+                    pass
+
+        self._evict()
+
+    def save(self) -> None:
+        self._save_timer.stop()
+        index = {
+            "version": INDEX_VERSION,
+            "entries": [[name, *entry] for name, entry in self._entries.items()],
+        }
+        try:
+            _write_atomic(
+                os.path.join(self.root, INDEX_FILE), json.dumps(index).encode()
+            )
+        except OSError:
+            pass
+
+    def _changed(self) -> None:
+        if not self._save_timer.isActive():
+            self._save_timer.start()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size": self.size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def contains(self, chapter_id: int, index: int, params: str) -> bool:
+        return self.key(chapter_id, index, params) in self._entries
+
+    def get(self, chapter_id: int, index: int, params: str) -> bytes | None:
+        name = self.key(chapter_id, index, params)
+        if name not in self._entries:
+            self.misses += 1
+            return None
+
+        try:
+            with open(self._path(name), "rb") as f:
+                data = f.read()
+        except OSError:
+            self.misses += 1
+            self._discard(name)
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(name)
+        self._changed()
+        return data
+
+    def put(self, chapter_id: int, index: int, params: str, data: bytes) -> None:
+        size = len(data)
+        if size > self.max_size:
+            return
+
+        name = self.key(chapter_id, index, params)
+        path = self._path(name)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _write_atomic(path, data)
+        except OSError:
+            return
+
+        if (entry := self._entries.pop(name, None)) is not None:
+            self.size -= entry[0]
+        self._entries[name] = (size, chapter_id, index)
+        self.size += size
+
+        self._evict()
+        self._changed()
+
+    def _discard(self, name: str) -> None:
+        if (entry := self._entries.pop(name, None)) is None:
+            return
+
+        self.size -= entry[0]
+        try:
+            os.remove(self._path(name))
+        except OSError:
+            pass
+        self._changed()
+
+    def discard_page(self, chapter_id: int, index: int) -> None:
+        # Every variant of the page goes
+        for name, (_, entry_chapter_id, entry_index) in list(self._entries.items()):
+            if entry_chapter_id == chapter_id and entry_index == index:
+                self._discard(name)
+
+    def discard_chapter(self, chapter_id: int) -> None:
+        for name, (_, entry_chapter_id, _) in list(self._entries.items()):
+            if entry_chapter_id == chapter_id:
+                self._discard(name)
+
+    def _evict(self) -> None:
+        while self.size > self.max_size and self._entries:
+            self._discard(next(iter(self._entries)))
+
+
+class StaleCache:
+    # Entries are fresh for `ttl` seconds, after that they can still be served
+    # while they are being refreshed until they are `max_age` seconds old
+
+    def __init__(self, ttl: float, max_age: float, max_entries: int = 256) -> None:
+        self.ttl = ttl
+        self.max_age = max(ttl, max_age)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+        # key -> (stored at, value)
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+        }
+
+    def get(self, key: Hashable) -> tuple[Any, bool] | None:
+        # Returns the value and whether it is still fresh
+        if (entry := self._entries.get(key)) is None:
+            self.misses += 1
+            return None
+
+        stored_at, value = entry
+        age = time.monotonic() - stored_at
+        if age > self.max_age:
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        if age > self.ttl:
+            self.stale_hits += 1
+            return value, False
+        self.hits += 1
+        return value, True
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and time.monotonic() - entry[0] <= self.max_age
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def discard_if(self, predicate: Callable[[Hashable], bool]) -> None:
+        for key in [key for key in self._entries if predicate(key)]:
+            del self._entries[key]
+
+
+class CategoryIndex(QObject):
+    # Categories by id, read from the database once and kept up to date from
+    # the app's signals. `verify` re-reads the table and rebuilds the index if
+    # it has drifted
+
+    def __init__(self, app: YomuApp) -> None:
+        super().__init__(app)
+        self.sql = app.sql
+        self.rebuilds = 0
+        self._categories: dict[int, Category] | None = None
+
+        app.category_created.connect(self._category_created)
+        app.category_deleted.connect(self._category_deleted)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._categories or ()),
+            "rebuilds": self.rebuilds,
+        }
+
+    def get(self, category_id: int) -> Category | None:
+        if self._categories is None:
+            self.rebuild()
+        return self._categories.get(category_id)
+
+    def rebuild(self) -> None:
+        self._build(self.sql.get_categories())
+
+    def verify(self) -> bool:
+        categories = self.sql.get_categories()
+        ids = {category.id for category in categories}
+        if self._categories is not None and self._categories.keys() == ids:
+            return True
+
+        self._build(categories)
+        return False
+
+    def _build(self, categories: list[Category]) -> None:
+        self.rebuilds += 1
+        self._categories = {category.id: category for category in categories}
+
+    def _category_created(self, category: Category) -> None:
+        if self._categories is not None:
+            self._categories[category.id] = category
+
+    def _category_deleted(self, category: Category) -> None:
+        if self._categories is not None:
+            self._categories.pop(category.id, None)
+
+
+class ModelCache(QObject):
+    # Manga and chapter models by id, along with their json once it's been
+    # asked for. Entries go away on the signals that say they changed, the
+    # `ttl` only covers state that changes without one, e.g. downloads
+
+    def __init__(
+        self,
+        app: YomuApp,
+        convert_manga: Callable[[Manga], dict],
+        convert_chapter: Callable[[Chapter], dict],
+        max_entries: int = 1024,
+        ttl: float = 30,
+    ) -> None:
+        super().__init__(app)
+        self.sql = app.sql
+        self.convert_manga = convert_manga
+        self.convert_chapter = convert_chapter
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        # (kind, id) -> [stored at, model, json]
+        self._entries: OrderedDict[tuple[str, int], list] = OrderedDict()
+
+        app.manga_details_updated.connect(self._manga_changed)
+        app.manga_library_status_changed.connect(self._manga_changed)
+        app.chapter_list_updated.connect(self._chapter_list_updated)
+        app.chapter_read_status_changed.connect(self._chapter_changed)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def get_manga(self, manga_id: int) -> Manga | None:
+        return self._get("manga", manga_id, self.sql.get_manga_by_id)
+
+    def get_chapter(self, chapter_id: int) -> Chapter | None:
+        return self._get("chapter", chapter_id, self.sql.get_chapter_by_id)
+
+    def manga_json(self, manga: Manga) -> dict:
+        return self._json("manga", manga, self.convert_manga)
+
+    def chapter_json(self, chapter: Chapter) -> dict:
+        return self._json("chapter", chapter, self.convert_chapter)
+
+    def _get(self, kind: str, id: int, load: Callable[[int], Any]) -> Any:
+        key = kind, id
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] <= self.ttl:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        model = load(id)
+        if model is None:
+            self._entries.pop(key, None)
+            return None
+
+        self._entries[key] = [time.monotonic(), model, None]
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return model
+
+    def _json(self, kind: str, model: Any, convert: Callable[[Any], dict]) -> dict:
+        entry = self._entries.get((kind, model.id))
+        if entry is None or entry[1] is not model:
+            return convert(model)
+
+        # Shared between responses, nothing may modify it
+        if entry[2] is None:
+            entry[2] = convert(model)
+        return entry[2]
+
+    def _manga_changed(self, manga: Manga) -> None:
+        self._entries.pop(("manga", manga.id), None)
+
+    def _chapter_list_updated(self, manga: Manga) -> None:
+        for key in [
+            key
+            for key, (_, model, _) in self._entries.items()
+            if key[0] == "chapter" and model.manga.id == manga.id
+        ]:
+            del self._entries[key]
+
+    def _chapter_changed(self, chapter: Chapter) -> None:
+        self._entries.pop(("chapter", chapter.id), None)
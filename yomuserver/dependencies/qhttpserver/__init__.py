@@ -1,5 +1,15 @@
 from .server import QHttpServer
 from .request import HttpRequest
-from .response import AsyncHttpResponse, HttpResponse, StatusCode
+from .response import (
+    AsyncHttpResponse,
+    HttpResponse,
+    StatusCode,
+    StreamingHttpResponse,
+)
+from .encoding import compress, is_compressible, negotiate_encoding
+from .conditional import etag_matches, http_date, is_not_modified, not_modified
 from .handler import *
-from .sse import SSEResponse
+from .singleflight import SingleFlight
+from .sse import SSEHub, SSEResponse
+from .static import StaticFile, StaticFiles, file_response
+from .worker import WorkerPool, WorkerTask
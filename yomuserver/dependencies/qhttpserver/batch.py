@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+from base64 import b64encode
+from typing import TYPE_CHECKING
+from urllib.parse import parse_qs, urlparse
+import json
+
+from PyQt6.QtCore import pyqtSignal, QObject
+
+from .request import HttpRequest, Method
+from .response import (
+    AsyncHttpResponse,
+    HttpResponse,
+    StatusCode,
+    StreamingHttpResponse,
+    HOP_BY_HOP_HEADERS,
+)
+from .sse import SSEResponse
+from .utils import get_header
+
+if TYPE_CHECKING:
+    from .server import QHttpServer
+
+__all__ = ("batch",)
+
+MAX_BATCH_SIZE = 20
+# The only headers of the batch request that sub-requests get as well, anything
+# else, e.g. If-None-Match, would apply to every one of them
+INHERITED_HEADERS = frozenset(("accept", "accept-language", "host", "user-agent"))
+# Ranges are served by the connection, which never sees the sub-requests
+IGNORED_HEADERS = frozenset(("range", "if-range"))
+
+
+def _result(response: HttpResponse) -> dict:
+    headers = {
+        key: value
+        for key, value in response.headers.items()
+        if key.lower() not in HOP_BY_HOP_HEADERS
+    }
+    result = {"status": int(response.status), "headers": headers, "body": None}
+
+    body = response.body
+    if not body:
+        return result
+
+    content_type = get_header(response.headers, "content-type") or ""
+    if content_type.startswith("application/json"):
+        result["body"] = json.loads(body)
+    elif content_type.startswith("text/"):
+        result["body"] = body.decode(errors="replace")
+    else:
+        result["body"] = b64encode(body).decode()
+        result["encoding"] = "base64"
+    return result
+
+
+def _error(status: StatusCode) -> dict:
+    return {"status": int(status), "headers": {}, "body": None}
+
+
+class Batch(QObject):
+    # Sub-requests are dispatched through the router one after the other, the
+    # ones that answer asynchronously are waited on together and the batch
+    # finishes once the last of them has
+    finished = pyqtSignal()
+
+    def __init__(self, server: QHttpServer, count: int, parent: QObject) -> None:
+        super().__init__(parent)
+        self.server = server
+        self.results: list[dict | None] = [None] * count
+        self.waiting = 0
+
+    def dispatch(self, index: int, request: HttpRequest, parent: QObject) -> None:
+        response = self.server._handle_request(request)
+        if isinstance(response, AsyncHttpResponse):
+            self.waiting += 1
+            response.setParent(parent)
+            response.finished.connect(
+                lambda _, __, response: self._finished(index, response)
+            )
+            response.error_occured.connect(
+                lambda error: self._error_occured(index, request, error)
+            )
+            return
+
+        self._set(index, response)
+
+    def _set(self, index: int, response: HttpResponse | SSEResponse) -> None:
+        if isinstance(response, SSEResponse):
+            response.deleteLater()
+            self.results[index] = _error(StatusCode.BAD_REQUEST)
+        elif isinstance(response, StreamingHttpResponse):
+            # Streamed bodies are meant for files, not for a json document
+            response.close()
+            self.results[index] = _error(StatusCode.NOT_IMPLEMENTED)
+        else:
+            try:
+                self.results[index] = _result(response)
+            except ValueError:
+                self.results[index] = _error(StatusCode.INTERNAL_SERVER_ERROR)
+
+    def _finished(self, index: int, response: HttpResponse) -> None:
+        self._set(index, response)
+        self._done()
+
+    def _error_occured(
+        self, index: int, request: HttpRequest, error: Exception
+    ) -> None:
+        self.server.logger.exception(
+            f"Exception occurred while handling batched {request}", exc_info=error
+        )
+        self.results[index] = _error(StatusCode.INTERNAL_SERVER_ERROR)
+        self._done()
+
+    def _done(self) -> None:
+        self.waiting -= 1
+        if self.waiting == 0:
+            self.finished.emit()
+
+    def response(self) -> HttpResponse:
+        return HttpResponse(json={"responses": self.results})
+
+
+def _batch_finished(_, batch: Batch) -> HttpResponse:
+    return batch.response()
+
+
+def _sub_request(request: HttpRequest, entry: dict, path: str) -> HttpRequest | None:
+    method = Method.get_method(str(entry.get("method", "GET")))
+    url = entry.get("path")
+    if method is None or not isinstance(url, str) or not url.startswith("/"):
+        return None
+
+    url = urlparse(url)
+    if url.path.rstrip("/") == path.rstrip("/"):
+        # No batches inside batches
+        return None
+
+    headers = {
+        key: value
+        for key, value in request.headers.items()
+        if key in INHERITED_HEADERS
+    }
+    if isinstance(entry.get("headers"), dict):
+        for key, value in entry["headers"].items():
+            key = str(key).lower()
+            if key not in HOP_BY_HOP_HEADERS and key not in IGNORED_HEADERS:
+                headers[key] = str(value)
+
+    body = entry.get("body")
+    if body is not None:
+        body = json.dumps(body).encode()
+        headers["content-type"] = "application/json"
+
+    return HttpRequest(
+        method, request.version, url.path, headers, body, parse_qs(url.query)
+    )
+
+
+def batch(server: QHttpServer, path: str, max_size: int = MAX_BATCH_SIZE):
+    def batch_handler(request: HttpRequest):
+        entries = request.json()
+        if isinstance(entries, dict):
+            entries = entries.get("requests")
+        if not isinstance(entries, list) or not all(
+            isinstance(entry, dict) for entry in entries
+        ):
+            return HttpResponse(status=StatusCode.BAD_REQUEST)
+        if len(entries) > max_size:
+            return HttpResponse(status=StatusCode.PAYLOAD_TOO_LARGE)
+
+        response = AsyncHttpResponse(request, _batch_finished)
+        handle = Batch(server, len(entries), response)
+        for index, entry in enumerate(entries):
+            sub_request = _sub_request(request, entry, path)
+            if sub_request is None:
+                handle.results[index] = _error(StatusCode.BAD_REQUEST)
+            else:
+                handle.dispatch(index, sub_request, response)
+
+        if handle.waiting == 0:
+            results = handle.response()
+            response.deleteLater()
+            return results
+
+        handle.finished.connect(response.wait_for_signal)
+        return response
+
+    return batch_handler
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from email.utils import formatdate, parsedate_to_datetime
+
+from .request import HttpRequest
+from .response import HttpResponse, StatusCode
+
+__all__ = ("etag_matches", "http_date", "is_not_modified", "not_modified")
+
+# Headers a 304 has to repeat from the 200 it stands in for
+NOT_MODIFIED_HEADERS = ("cache-control", "etag", "expires", "last-modified", "vary")
+
+
+def http_date(timestamp: float) -> str:
+    return formatdate(timestamp, usegmt=True)
+
+
+def parse_http_date(value: str) -> float | None:
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison, W/"x" and "x" are the same tag
+    if header.strip() == "*":
+        return True
+
+    etag = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def is_not_modified(
+    request: HttpRequest, etag: str | None = None, last_modified: float | None = None
+) -> bool:
+    if request.method != "GET":
+        return False
+
+    # If-Modified-Since is only looked at when there's no If-None-Match
+    if_none_match = request.get_header("If-None-Match")
+    if if_none_match is not None:
+        return etag is not None and etag_matches(if_none_match, etag)
+
+    if_modified_since = request.get_header("If-Modified-Since")
+    if if_modified_since is None or last_modified is None:
+        return False
+
+    since = parse_http_date(if_modified_since)
+    return since is not None and int(last_modified) <= since
+
+
+def not_modified(headers: dict) -> HttpResponse:
+    return HttpResponse(
+        StatusCode.NOT_MODIFIED,
+        {
+            key: value
+            for key, value in headers.items()
+            if key.lower() in NOT_MODIFIED_HEADERS
+        },
+    )
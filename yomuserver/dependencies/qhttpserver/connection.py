@@ -0,0 +1,324 @@
+from __future__ import annotations
+
+from collections import deque
+from logging import getLogger
+from typing import Iterator, TYPE_CHECKING
+
+from PyQt6.QtCore import QObject, QTimer
+from PyQt6.QtNetwork import QTcpSocket
+
+from .encoding import compress_response
+from .parser import HttpParseError, RequestParser
+from .ranges import range_response
+from .request import HttpRequest
+from .response import (
+    convert_response_head,
+    convert_response_to_http,
+    AsyncHttpResponse,
+    HttpResponse,
+    StatusCode,
+    StreamingHttpResponse,
+)
+from .sse import SSEResponse, SSEResponseHandler
+from .utils import pyqtSlot
+
+if TYPE_CHECKING:
+    from .server import QHttpServer
+
+# How many requests a client may pipeline before we stop reading from the socket
+MAX_PIPELINED_REQUESTS = 16
+# How much the socket reads ahead of us, a client that keeps sending while its
+# pipeline is full is held back by TCP once this fills up
+READ_BUFFER_SIZE = 64 * 1024
+# How much unsent data a connection may queue in its socket before waiting
+WRITE_BUFFER_SIZE = 256 * 1024
+WRITE_CHUNK_SIZE = 64 * 1024
+
+
+class PendingReply:
+    def __init__(self, request: HttpRequest | None) -> None:
+        self.request = request
+        self.response: HttpResponse | SSEResponse | None = None
+
+
+# Replies are always written in the order their requests came in, a pipelined
+# request that finishes early waits for the AsyncHttpResponse in front of it
+class HttpConnection(QObject):
+    def __init__(self, server: QHttpServer, client: QTcpSocket, timeout: int) -> None:
+        super().__init__(server)
+        self.server = server
+        self.client = client
+        self.logger = server.logger
+
+        self._parser = RequestParser(server.max_header_size, server.max_body_size)
+        self._pending: deque[PendingReply] = deque()
+        self._closing = False
+        self._detached = False
+        self._outgoing: Iterator[bytes] | None = None
+        self._keep_alive = False
+
+        self._idle_timer = QTimer(self)
+        self._idle_timer.setSingleShot(True)
+        self._idle_timer.setInterval(timeout)
+        self._idle_timer.timeout.connect(self._idle_timeout)
+        self._idle_timer.start()
+
+        client.setReadBufferSize(READ_BUFFER_SIZE)
+        client.readyRead.connect(self._data_received)
+        client.bytesWritten.connect(self._bytes_written)
+        client.disconnected.connect(self._disconnected)
+
+    @pyqtSlot(getLogger(__name__))
+    def _data_received(self) -> None:
+        if self._closing or self._detached:
+            return
+
+        self._idle_timer.stop()
+        self._process_buffer()
+
+    @pyqtSlot(getLogger(__name__))
+    def _bytes_written(self, _: int) -> None:
+        if self._outgoing is not None:
+            self._flush()
+            self._process_buffer()
+
+    def _process_buffer(self) -> None:
+        while (
+            not self._closing
+            and not self._detached
+            and len(self._pending) < MAX_PIPELINED_REQUESTS
+        ):
+            try:
+                request = self._parser.next_request()
+            except HttpParseError as e:
+                self.logger.error(f"Failed to parse message: {e}")
+                return self._bad_request(e.status)
+
+            if request is None:
+                # More is only read once there's room in the pipeline and what
+                # was read already doesn't make up a request
+                if not self.client.bytesAvailable():
+                    break
+                self._parser.feed(self.client.readAll().data())
+                continue
+
+            self._handle_request(request)
+
+        self._start_idle_timer()
+
+    def _handle_request(self, request: HttpRequest) -> None:
+        pending = PendingReply(request)
+        self._pending.append(pending)
+
+        response = self.server._handle_request(request)
+        if isinstance(response, AsyncHttpResponse):
+            response.setParent(self)
+            response._set_client(self.client)
+            response.finished.connect(self.reply)
+            response.error_occured.connect(self._async_response_error)
+            return
+
+        pending.response = response
+        self._flush()
+
+    @pyqtSlot(getLogger(__name__))
+    def reply(
+        self, client: QTcpSocket, request: HttpRequest, response: HttpResponse
+    ) -> None:
+        for pending in self._pending:
+            if pending.request is request and pending.response is None:
+                pending.response = response
+                break
+        else:
+            return
+
+        self._flush()
+        self._process_buffer()
+
+    def _async_response_error(self, error: Exception) -> None:
+        response: AsyncHttpResponse = self.sender()
+        self.logger.exception(
+            f"Exception occurred while calling {response.func.__name__}", exc_info=error
+        )
+
+        self.reply(
+            self.client,
+            response.request,
+            HttpResponse(status=StatusCode.INTERNAL_SERVER_ERROR),
+        )
+
+    def _flush(self) -> None:
+        while True:
+            if self._outgoing is not None:
+                if not self._pump():
+                    return
+
+                self._outgoing = None
+                if not self._keep_alive:
+                    return self._close()
+
+            if not self._pending or self._pending[0].response is None:
+                return self._start_idle_timer()
+
+            pending = self._pending.popleft()
+            request, response = pending.request, pending.response
+            if request is None:
+                self.client.write(convert_response_to_http(response))
+                return self._close()
+
+            if isinstance(response, SSEResponse):
+                # The event stream owns the socket from here on
+                self._detached = True
+                self._idle_timer.stop()
+                SSEResponseHandler(self.server, self.client, request, response)
+                return
+
+            try:
+                self._start_reply(request, response)
+            except Exception as e:
+                # Nothing has been written for it yet, so a 500 can still go out
+                # in its place
+                self.logger.exception(f"Failed to start reply to {request}", exc_info=e)
+                if isinstance(response, StreamingHttpResponse):
+                    response.close()
+                error = HttpResponse(status=StatusCode.INTERNAL_SERVER_ERROR)
+                self.client.write(convert_response_to_http(error))
+                return self._close()
+
+    def _start_reply(self, request: HttpRequest, response: HttpResponse) -> None:
+        address, port, method, path, status = (
+            self.client.peerAddress().toString(),
+            self.client.peerPort(),
+            request.method,
+            request.path,
+            response.status,
+        )
+
+        log_message = (
+            f"{address}:{port} - {method} {path} HTTP/1.1 {status} {status.to_str()}"
+        )
+        self.logger.debug(log_message)
+
+        # A Range applies to whatever representation the handler picked, so
+        # the server doesn't compress on top of it
+        if self.server.compression and request.get_header("Range") is None:
+            response = compress_response(
+                request, response, self.server.compression_min_size
+            )
+        response = range_response(request, response)
+
+        if isinstance(response, StreamingHttpResponse):
+            content_length = response.content_length
+            chunks = response.chunks()
+        else:
+            body = response.body
+            content_length = len(body)
+            chunks = (
+                body[i : i + WRITE_CHUNK_SIZE]
+                for i in range(0, content_length, WRITE_CHUNK_SIZE)
+            )
+
+        keep_alive = request.keep_alive and self.server.is_running
+        if content_length is None and request.version < 1.1:
+            keep_alive = False
+
+        self._keep_alive = keep_alive
+        self._outgoing = self._body(response, content_length, keep_alive, chunks)
+
+    def _body(
+        self,
+        response: HttpResponse,
+        content_length: int | None,
+        keep_alive: bool,
+        chunks: Iterator[bytes],
+    ) -> Iterator[bytes]:
+        yield convert_response_head(response, content_length, keep_alive)
+
+        if content_length is None and keep_alive:
+            for chunk in chunks:
+                yield f"{len(chunk):x}\r\n".encode()
+                yield chunk
+                yield b"\r\n"
+            yield b"0\r\n\r\n"
+            return
+
+        remaining = content_length
+        for chunk in chunks:
+            if remaining is not None:
+                chunk = chunk[:remaining]
+                remaining -= len(chunk)
+            yield chunk
+            if remaining == 0:
+                break
+
+        if remaining:
+            raise ValueError(f"Body ended {remaining} bytes short of Content-Length")
+
+    def _pump(self) -> bool:
+        # Only a bounded amount of the reply sits in the socket's buffer, the
+        # rest is pulled in from bytesWritten as the client catches up
+        while self.client.bytesToWrite() < WRITE_BUFFER_SIZE:
+            try:
+                chunk = next(self._outgoing)
+            except StopIteration:
+                return True
+            except Exception as e:
+                self.logger.exception("Failed to write response body", exc_info=e)
+                self._outgoing = None
+                self._close()
+                return False
+
+            self.client.write(chunk)
+        return False
+
+    def _bad_request(self, status: StatusCode) -> None:
+        # Nothing past a malformed request can be trusted, so the error goes out
+        # after the replies still owed and then the connection is closed
+        self._closing = True
+        pending = PendingReply(None)
+        pending.response = HttpResponse(status=status)
+        self._pending.append(pending)
+        self._flush()
+
+    def _close(self) -> None:
+        if self._outgoing is not None:
+            self._outgoing.close()
+            self._outgoing = None
+        self._closing = True
+        self._idle_timer.stop()
+        self._pending.clear()
+        self.client.disconnectFromHost()
+
+    def shutdown(self) -> None:
+        # Connections with replies still in flight close once they're written
+        if self._is_idle():
+            self._close()
+
+    def _is_idle(self) -> bool:
+        return not (
+            self._pending
+            or self._outgoing is not None
+            or self._closing
+            or self._detached
+        )
+
+    def _start_idle_timer(self) -> None:
+        if self._is_idle():
+            self._idle_timer.start()
+
+    def _idle_timeout(self) -> None:
+        if not self._is_idle():
+            return
+
+        address, port = self.client.peerAddress().toString(), self.client.peerPort()
+        self.logger.debug(f"Closing idle connection {address}:{port}")
+        self._close()
+
+    def _disconnected(self) -> None:
+        self._idle_timer.stop()
+        self._pending.clear()
+        if self._outgoing is not None:
+            self._outgoing.close()
+            self._outgoing = None
+        self.client.deleteLater()
+        self.deleteLater()
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import zlib
+
+from .request import HttpRequest
+from .response import HttpResponse, StatusCode, StreamingHttpResponse
+from .utils import get_header
+
+__all__ = (
+    "compress",
+    "compress_response",
+    "is_compressible",
+    "negotiate_encoding",
+)
+
+ENCODINGS = {"gzip": 31, "deflate": zlib.MAX_WBITS}
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "image/x-icon",
+    "image/vnd.microsoft.icon",
+)
+MIN_COMPRESS_SIZE = 1024
+
+
+def is_compressible(content_type: str | None) -> bool:
+    if content_type is None:
+        return False
+    content_type = content_type.split(";", 1)[0].strip().lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def negotiate_encoding(request: HttpRequest) -> str | None:
+    header = request.get_header("Accept-Encoding")
+    if not header:
+        return None
+
+    weights: dict[str, float] = {}
+    for item in header.split(","):
+        name, *params = item.strip().split(";")
+        weight = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in ENCODINGS:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def compress(data: bytes, encoding: str, level: int = 6) -> bytes:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, ENCODINGS[encoding])
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_response(
+    request: HttpRequest, response: HttpResponse, min_size: int = MIN_COMPRESS_SIZE
+) -> HttpResponse:
+    # The response may be shared with other requests, so a compressed copy is
+    # returned rather than changing it in place
+    if (
+        isinstance(response, StreamingHttpResponse)
+        or response.status in (StatusCode.NO_CONTENT, StatusCode.NOT_MODIFIED)
+        or len(response.body) < min_size
+        or get_header(response.headers, "content-encoding") is not None
+        or not is_compressible(get_header(response.headers, "content-type"))
+    ):
+        return response
+
+    headers = {
+        key: value for key, value in response.headers.items() if key.lower() != "vary"
+    }
+    vary = get_header(response.headers, "vary")
+    if not vary:
+        headers["Vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        headers["Vary"] = f"{vary}, Accept-Encoding"
+    else:
+        headers["Vary"] = vary
+
+    encoding = negotiate_encoding(request)
+    if encoding is None:
+        return HttpResponse(response.status, headers, response.body)
+
+    headers["Content-Encoding"] = encoding
+    return HttpResponse(response.status, headers, compress(response.body, encoding))
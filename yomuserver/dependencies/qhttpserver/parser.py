@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+from urllib.parse import parse_qs, urlparse
+
+from .request import HttpRequest, Method
+from .response import StatusCode
+
+MAX_HEADER_SIZE = 16 * 1024
+MAX_BODY_SIZE = 16 * 1024 * 1024
+
+
+class HttpParseError(Exception):
+    def __init__(self, status: StatusCode, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class RequestParser:
+    # Bytes from the socket are fed in as they arrive, whole requests come out
+    # once their headers and body are complete
+
+    def __init__(
+        self, max_header_size: int = MAX_HEADER_SIZE, max_body_size: int = MAX_BODY_SIZE
+    ) -> None:
+        self.max_header_size = max_header_size
+        self.max_body_size = max_body_size
+
+        self._buffer = bytearray()
+        self._scanned = 0
+        self._request: HttpRequest | None = None
+        self._content_length = 0
+        self._chunked = False
+        self._chunks = bytearray()
+
+    def feed(self, data: bytes) -> None:
+        self._buffer += data
+
+    def next_request(self) -> HttpRequest | None:
+        if self._request is None and not self._parse_head():
+            return None
+
+        if self._chunked:
+            body = self._parse_chunks()
+        else:
+            body = self._parse_body()
+        if body is None:
+            return None
+
+        request, self._request = self._request, None
+        request.body = body or None
+        return request
+
+    def _parse_head(self) -> bool:
+        end = self._buffer.find(b"\r\n\r\n", self._scanned)
+        if end == -1:
+            if len(self._buffer) > self.max_header_size:
+                raise HttpParseError(
+                    StatusCode.REQUEST_HEADER_FIELDS_TOO_LARGE, "Headers are too large"
+                )
+            # The terminator may straddle two reads
+            self._scanned = max(len(self._buffer) - 3, 0)
+            return False
+
+        if end > self.max_header_size:
+            raise HttpParseError(
+                StatusCode.REQUEST_HEADER_FIELDS_TOO_LARGE, "Headers are too large"
+            )
+
+        head = self._buffer[:end].decode("latin-1")
+        del self._buffer[: end + 4]
+        self._scanned = 0
+
+        request_line, *lines = head.split("\r\n")
+        try:
+            method_name, target, protocol = request_line.split(" ")
+            name, version = protocol.split("/")
+            if name != "HTTP":
+                raise ValueError(protocol)
+            version = float(version)
+        except ValueError:
+            raise HttpParseError(StatusCode.BAD_REQUEST, "Malformed request line")
+
+        method = Method.get_method(method_name)
+        if method is None:
+            raise HttpParseError(
+                StatusCode.BAD_REQUEST, f"Unknown method {method_name}"
+            )
+
+        headers: dict[str, str] = {}
+        for line in lines:
+            key, sep, value = line.partition(":")
+            key = key.strip().lower()
+            if not sep or not key:
+                raise HttpParseError(StatusCode.BAD_REQUEST, "Malformed header")
+
+            value = value.strip()
+            headers[key] = f"{headers[key]}, {value}" if key in headers else value
+
+        transfer_encoding = headers.get("transfer-encoding")
+        content_length = headers.get("content-length")
+        if transfer_encoding is not None:
+            if content_length is not None:
+                raise HttpParseError(
+                    StatusCode.BAD_REQUEST, "Both Content-Length and Transfer-Encoding"
+                )
+            if transfer_encoding.lower() != "chunked":
+                raise HttpParseError(
+                    StatusCode.NOT_IMPLEMENTED,
+                    f"Unsupported Transfer-Encoding {transfer_encoding}",
+                )
+
+        self._chunked = transfer_encoding is not None
+        self._content_length = 0
+        if content_length is not None:
+            try:
+                self._content_length = int(content_length)
+            except ValueError:
+                self._content_length = -1
+            if self._content_length < 0:
+                raise HttpParseError(StatusCode.BAD_REQUEST, "Invalid Content-Length")
+            if self._content_length > self.max_body_size:
+                raise HttpParseError(StatusCode.PAYLOAD_TOO_LARGE, "Body is too large")
+
+        url = urlparse(target)
+        self._request = HttpRequest(
+            method, version, url.path, headers, None, parse_qs(url.query)
+        )
+        return True
+
+    def _parse_body(self) -> bytes | None:
+        length = self._content_length
+        if len(self._buffer) < length:
+            return None
+
+        # Slicing through a memoryview keeps this to a single copy of the body
+        with memoryview(self._buffer) as view:
+            body = bytes(view[:length])
+        del self._buffer[:length]
+        return body
+
+    def _parse_chunks(self) -> bytes | None:
+        while True:
+            end = self._buffer.find(b"\r\n")
+            if end == -1:
+                if len(self._buffer) > self.max_header_size:
+                    raise HttpParseError(StatusCode.BAD_REQUEST, "Malformed chunk size")
+                return None
+
+            size_line = self._buffer[:end].split(b";", 1)[0]
+            try:
+                size = int(size_line, 16)
+            except ValueError:
+                raise HttpParseError(StatusCode.BAD_REQUEST, "Malformed chunk size")
+
+            if size == 0:
+                # Trailers are read and thrown away
+                trailers_end = self._buffer.find(b"\r\n\r\n", end)
+                if trailers_end == -1:
+                    return None
+
+                del self._buffer[: trailers_end + 4]
+                body = bytes(self._chunks)
+                self._chunks.clear()
+                return body
+
+            if len(self._chunks) + size > self.max_body_size:
+                raise HttpParseError(StatusCode.PAYLOAD_TOO_LARGE, "Body is too large")
+
+            start = end + 2
+            if len(self._buffer) < start + size + 2:
+                return None
+
+            end = start + size
+            if self._buffer[end : end + 2] != b"\r\n":
+                raise HttpParseError(StatusCode.BAD_REQUEST, "Malformed chunk")
+
+            with memoryview(self._buffer) as view:
+                self._chunks += view[start:end]
+            del self._buffer[: end + 2]
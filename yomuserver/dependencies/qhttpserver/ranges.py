@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+from typing import BinaryIO, Iterator
+import os
+
+from .request import HttpRequest
+from .response import HttpResponse, StatusCode, StreamingHttpResponse
+from .utils import get_header
+
+__all__ = ("parse_range", "range_response")
+
+# More ranges than this and the whole body is sent instead
+MAX_RANGES = 16
+
+
+def parse_range(header: str, length: int) -> list[tuple[int, int]] | None:
+    # Returns inclusive (start, end) pairs, an empty list when none of them
+    # can be satisfied and None when the header should be ignored
+    unit, _, ranges = header.partition("=")
+    if unit.strip().lower() != "bytes" or not ranges:
+        return None
+
+    result = []
+    for spec in ranges.split(","):
+        first, sep, last = spec.strip().partition("-")
+        if not sep:
+            return None
+
+        try:
+            if not first:
+                # Suffix range, the last N bytes
+                suffix = int(last)
+                if suffix <= 0:
+                    continue
+                start, end = max(length - suffix, 0), length - 1
+            else:
+                start = int(first)
+                end = int(last) if last else length - 1
+                if last and end < start:
+                    return None
+                end = min(end, length - 1)
+        except ValueError:
+            return None
+
+        if start < 0:
+            return None
+        if start < length:
+            result.append((start, end))
+
+    if len(result) > MAX_RANGES:
+        return None
+    return result
+
+
+def _if_range_matches(request: HttpRequest, response: HttpResponse) -> bool:
+    if_range = request.get_header("If-Range")
+    if if_range is None:
+        return True
+
+    if_range = if_range.strip()
+    if if_range.startswith(('"', 'W/"')):
+        # Only strong validators are allowed here
+        etag = get_header(response.headers, "etag")
+        return not if_range.startswith("W/") and etag == if_range
+    return get_header(response.headers, "last-modified") == if_range
+
+
+def _content_length(response: HttpResponse) -> int | None:
+    if not isinstance(response, StreamingHttpResponse):
+        return len(response.body)
+
+    stream = response.stream
+    if response.content_length is None or not hasattr(stream, "seek"):
+        return None
+    try:
+        if not stream.seekable():
+            return None
+    except (AttributeError, OSError, ValueError):
+        return None
+    return response.content_length
+
+
+def _read_file(
+    stream: BinaryIO, offset: int, length: int, chunk_size: int
+) -> Iterator[bytes]:
+    stream.seek(offset)
+    while length > 0 and (chunk := stream.read(min(chunk_size, length))):
+        length -= len(chunk)
+        yield chunk
+
+
+def _part(response: HttpResponse, base: int, start: int, end: int) -> Iterator[bytes]:
+    if isinstance(response, StreamingHttpResponse):
+        yield from _read_file(
+            response.stream, base + start, end - start + 1, response.chunk_size
+        )
+    else:
+        yield response.body[start : end + 1]
+
+
+def _part_head(
+    boundary: str, content_type: str | None, start: int, end: int, length: int
+) -> bytes:
+    head = f"\r\n--{boundary}\r\n"
+    if content_type is not None:
+        head += f"Content-Type: {content_type}\r\n"
+    head += f"Content-Range: bytes {start}-{end}/{length}\r\n\r\n"
+    return head.encode()
+
+
+def _multipart(
+    response: HttpResponse,
+    base: int,
+    ranges: list[tuple[int, int]],
+    length: int,
+    content_type: str | None,
+    boundary: str,
+) -> Iterator[bytes]:
+    try:
+        for start, end in ranges:
+            yield _part_head(boundary, content_type, start, end, length)
+            yield from _part(response, base, start, end)
+        yield f"\r\n--{boundary}--\r\n".encode()
+    finally:
+        if isinstance(response, StreamingHttpResponse):
+            response.close()
+
+
+def _single(
+    response: HttpResponse, base: int, start: int, end: int
+) -> Iterator[bytes]:
+    try:
+        yield from _part(response, base, start, end)
+    finally:
+        if isinstance(response, StreamingHttpResponse):
+            response.close()
+
+
+def range_response(request: HttpRequest, response: HttpResponse) -> HttpResponse:
+    # Like compression this never changes the response it was given, a new one
+    # is built for the requested part
+    if (
+        request.method != "GET"
+        or response.status != StatusCode.OK
+        or get_header(response.headers, "content-range") is not None
+        or (length := _content_length(response)) is None
+    ):
+        return response
+
+    headers = {
+        key: value
+        for key, value in response.headers.items()
+        if key.lower() != "accept-ranges"
+    }
+    headers["Accept-Ranges"] = "bytes"
+
+    header = request.get_header("Range")
+    if header is None or not _if_range_matches(request, response):
+        ranges = None
+    else:
+        ranges = parse_range(header, length)
+
+    if ranges is None:
+        if isinstance(response, StreamingHttpResponse):
+            return StreamingHttpResponse(
+                response.status,
+                headers,
+                response.stream,
+                response.content_length,
+                response.chunk_size,
+            )
+        return HttpResponse(response.status, headers, response.body)
+
+    if not ranges:
+        if isinstance(response, StreamingHttpResponse):
+            response.close()
+        return HttpResponse(
+            StatusCode.RANGE_NOT_SATISFIABLE,
+            {"Content-Range": f"bytes */{length}"},
+        )
+
+    base = response.stream.tell() if isinstance(response, StreamingHttpResponse) else 0
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+        if not isinstance(response, StreamingHttpResponse):
+            return HttpResponse(
+                StatusCode.PARTIAL_CONTENT, headers, response.body[start : end + 1]
+            )
+        return StreamingHttpResponse(
+            StatusCode.PARTIAL_CONTENT,
+            headers,
+            _single(response, base, start, end),
+            end - start + 1,
+        )
+
+    boundary = os.urandom(12).hex()
+    content_type = None
+    for key in list(headers):
+        if key.lower() == "content-type":
+            content_type = headers.pop(key)
+    headers["Content-Type"] = f"multipart/byteranges; boundary={boundary}"
+
+    # The size of a multipart body is easy to work out up front
+    size = len(f"\r\n--{boundary}--\r\n")
+    for start, end in ranges:
+        size += len(_part_head(boundary, content_type, start, end, length))
+        size += end - start + 1
+
+    return StreamingHttpResponse(
+        StatusCode.PARTIAL_CONTENT,
+        headers,
+        _multipart(response, base, ranges, length, content_type, boundary),
+        size,
+    )
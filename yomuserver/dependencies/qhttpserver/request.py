@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 from enum import StrEnum
-from urllib.parse import parse_qs, urlparse
 import json
 
 
@@ -26,47 +25,30 @@ class HttpRequest:
         version: float,
         path: str,
         headers: dict,
-        body: str | None,
+        body: bytes | None,
         params: dict,
     ) -> None:
         self.method = method
         self.version = version
         self.path = path
-        self.headers = headers
+        self.headers = {key.lower(): value for key, value in headers.items()}
         self.body = body
 
         self.path_params = {}
         self.query_params: dict = params.copy()
 
-    @classmethod
-    def from_raw_data(cls, data: bytes) -> HttpRequest | None:
-        request = data.decode()
-        if not (lines := request.split("\r\n")):
-            return None
-        http_info = lines[0].split(" ")
-
-        method = Method.get_method(http_info[0])
-        if method is None:
-            return None
-
-        parsed_url_path = urlparse(http_info[1])
-        path = parsed_url_path.path
-        query_params = parse_qs(parsed_url_path.query)
-
-        version = float(http_info[2].split("/")[1])
-
-        headers = {}
-        for i, line in enumerate(lines[1:], start=1):
-            if not line:
-                break
-
-            key, value = line.split(": ")
-            headers[key] = value
-        else:
-            i += 1
-
-        body = "\n".join(lines[i:]) if i < len(lines) else None
-        return cls(method, version, path, headers, body, query_params)
+    def get_header(self, name: str, default: str | None = None) -> str | None:
+        return self.headers.get(name.lower(), default)
+
+    @property
+    def keep_alive(self) -> bool:
+        connection = self.get_header("Connection", "")
+        tokens = {token.strip().lower() for token in connection.split(",")}
+        if "close" in tokens:
+            return False
+        if self.version >= 1.1:
+            return True
+        return "keep-alive" in tokens
 
     def json(self) -> dict | None:
         if not self.body:
@@ -1,12 +1,14 @@
 from __future__ import annotations
 
 from enum import IntEnum
-from typing import Callable
+from typing import BinaryIO, Callable, Iterable, Iterator
 import json as serializer
+import os
 
 from PyQt6.QtCore import pyqtSignal, QObject
 from PyQt6.QtNetwork import QTcpSocket
 from .request import HttpRequest
+from .utils import get_header
 
 
 class StatusCode(IntEnum):
@@ -19,6 +21,9 @@ class StatusCode(IntEnum):
     RESET_CONTENT = 205
     PARTIAL_CONTENT = 206
 
+    # Redirection
+    NOT_MODIFIED = 304
+
     # Client Error
     BAD_REQUEST = 400
     UNAUTHORIZED = 401
@@ -26,9 +31,13 @@ class StatusCode(IntEnum):
     NOT_FOUND = 404
     METHOD_NOT_ALLOWED = 405
     REQUEST_TIMEOUT = 408
+    PAYLOAD_TOO_LARGE = 413
+    RANGE_NOT_SATISFIABLE = 416
+    REQUEST_HEADER_FIELDS_TOO_LARGE = 431
 
     # Server Error
     INTERNAL_SERVER_ERROR = 500
+    NOT_IMPLEMENTED = 501
 
     def to_str(self):
         if self == StatusCode.OK:
@@ -45,6 +54,8 @@ class StatusCode(IntEnum):
             return "RESET CONTENT"
         if self == StatusCode.PARTIAL_CONTENT:
             return "PARTIAL CONTENT"
+        if self == StatusCode.NOT_MODIFIED:
+            return "NOT MODIFIED"
         if self == StatusCode.BAD_REQUEST:
             return "BAD REQUEST"
         if self == StatusCode.UNAUTHORIZED:
@@ -57,8 +68,16 @@ class StatusCode(IntEnum):
             return "METHOD NOT ALLOWED"
         if self == StatusCode.REQUEST_TIMEOUT:
             return "REQUEST TIMEOUT"
+        if self == StatusCode.PAYLOAD_TOO_LARGE:
+            return "PAYLOAD TOO LARGE"
+        if self == StatusCode.RANGE_NOT_SATISFIABLE:
+            return "RANGE NOT SATISFIABLE"
+        if self == StatusCode.REQUEST_HEADER_FIELDS_TOO_LARGE:
+            return "REQUEST HEADER FIELDS TOO LARGE"
         if self == StatusCode.INTERNAL_SERVER_ERROR:
             return "INTERNAL SERVER ERROR"
+        if self == StatusCode.NOT_IMPLEMENTED:
+            return "NOT IMPLEMENTED"
 
 
 class HttpResponse:
@@ -74,6 +93,8 @@ class HttpResponse:
 
         if json is not None:
             self.body = serializer.dumps(json).encode()
+            if get_header(self.headers, "content-type") is None:
+                self.headers["Content-Type"] = "application/json"
         elif isinstance(body, str):
             self.body = body.encode()
         elif body is None:
@@ -82,6 +103,45 @@ class HttpResponse:
             self.body = body
 
 
+class StreamingHttpResponse(HttpResponse):
+    # The body is pulled from an iterable of bytes or a binary file object as
+    # the socket drains, the whole thing is never held in memory at once
+    def __init__(
+        self,
+        status: StatusCode = StatusCode.OK,
+        headers: dict | None = None,
+        body: Iterable[bytes] | BinaryIO = (),
+        content_length: int | None = None,
+        chunk_size: int = 64 * 1024,
+    ):
+        super().__init__(status, headers)
+        self.stream = body
+        self.chunk_size = chunk_size
+
+        if content_length is None and hasattr(body, "fileno"):
+            try:
+                content_length = os.fstat(body.fileno()).st_size - body.tell()
+            except (OSError, ValueError):
+                content_length = None
+        self.content_length = content_length
+
+    def chunks(self) -> Iterator[bytes]:
+        try:
+            if hasattr(self.stream, "read"):
+                while chunk := self.stream.read(self.chunk_size):
+                    yield chunk
+            else:
+                for chunk in self.stream:
+                    if chunk:
+                        yield chunk
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if hasattr(self.stream, "close"):
+            self.stream.close()
+
+
 class AsyncHttpResponse(QObject):
     finished = pyqtSignal((QTcpSocket, HttpRequest, HttpResponse))
     error_occured = pyqtSignal(Exception)
@@ -107,6 +167,13 @@ class AsyncHttpResponse(QObject):
         except Exception as e:
             return self.error_occured.emit(e)
 
+        if isinstance(response, AsyncHttpResponse):
+            # The rest of the work was handed off again, e.g. to a worker thread
+            response.setParent(self)
+            response.finished.connect(self._chained_finished)
+            response.error_occured.connect(self.error_occured)
+            return
+
         if not isinstance(response, HttpResponse):
             return self.error_occured.emit(
                 TypeError(f"Expected type `HttpResponse` not `{type(response)}`"),
@@ -114,18 +181,55 @@ class AsyncHttpResponse(QObject):
 
         self.finished.emit(self._client, self.request, response)
 
+    def _chained_finished(self, _, __, response: HttpResponse) -> None:
+        self.finished.emit(self._client, self.request, response)
+
     def _set_client(self, client: QTcpSocket):
         self._client = client
         client.disconnected.connect(self.deleteLater)
 
 
-def convert_response_to_http(response: HttpResponse) -> bytes:
+HOP_BY_HOP_HEADERS = frozenset(
+    (
+        "connection",
+        "content-length",
+        "keep-alive",
+        "proxy-connection",
+        "te",
+        "trailer",
+        "transfer-encoding",
+        "upgrade",
+    )
+)
+
+
+def convert_response_head(
+    response: HttpResponse, content_length: int | None, keep_alive: bool
+) -> bytes:
     status = response.status
     status_name = status.to_str()
 
-    headers = "\r\n".join(f"{key}: {value}" for key, value in response.headers.items())
-    if len(headers):
-        headers += "\r\n"
-
+    # Framing is owned by the server, handlers (and upstream replies they copy
+    # headers from) don't get to decide how the message is delimited
+    headers = {
+        key: value
+        for key, value in response.headers.items()
+        if key.lower() not in HOP_BY_HOP_HEADERS
+    }
+    # Without a length the body is chunked, unless the connection closes after
+    # this reply in which case the close marks the end
+    if status in (StatusCode.NO_CONTENT, StatusCode.NOT_MODIFIED):
+        pass
+    elif content_length is not None:
+        headers["Content-Length"] = content_length
+    elif keep_alive:
+        headers["Transfer-Encoding"] = "chunked"
+    headers["Connection"] = "keep-alive" if keep_alive else "close"
+
+    headers = "".join(f"{key}: {value}\r\n" for key, value in headers.items())
+    return f"HTTP/1.1 {status} {status_name}\r\n{headers}\r\n".encode()
+
+
+def convert_response_to_http(response: HttpResponse, keep_alive: bool = False) -> bytes:
     body = response.body.encode() if isinstance(response.body, str) else response.body
-    return f"HTTP/1.1 {status} {status_name}\r\n{headers}\r\n".encode() + body
+    return convert_response_head(response, len(body), keep_alive) + body
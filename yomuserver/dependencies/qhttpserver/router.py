@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 from typing import Any, Callable, TYPE_CHECKING
-import re
 
 from .request import HttpRequest, Method
 from .response import HttpResponse
@@ -16,12 +15,14 @@ if TYPE_CHECKING:
 
 class Route:
     def __init__(self, method: Method, path: str, func: T_Func) -> None:
-        has_path_params, path, params = utils.check_regex(path)
+        segments = utils.compile_path(path)
 
-        self.path = path
+        # Param names don't take part in the key, `/<id:int>` and `/<page:int>`
+        # are the same route
+        self.path = "/" + "/".join(segment.key for segment in segments)
+        self.segments = segments
         self.methods = {method: func}
-        self.has_path_params = has_path_params
-        self._params_converter = params
+        self.has_path_params = any(segment.params for segment in segments)
 
     def __eq__(self, other: Any) -> bool:
         if not isinstance(other, Route):
@@ -31,40 +32,94 @@ class Route:
     def __ne__(self, other: Any) -> bool:
         return not self.__eq__(other)
 
-    def matches(self, path: str) -> bool:
-        return bool(re.match(self.path, path))
 
-    def get_params(self, path: str) -> dict[str, Any]:
-        m = re.search(self.path, path)
-        if m is None:
-            return {}
+class Node:
+    def __init__(self) -> None:
+        self.static: dict[str, Node] = {}
+        self.dynamic: list[tuple[utils.Segment, Node]] = []
+        self.route: Route | None = None
 
-        return {
-            name: cls(group)
-            for group, (name, cls) in zip(m.groups(), self._params_converter.items())
-        }
+    def child(self, segment: utils.Segment) -> Node:
+        if segment.pattern is None:
+            return self.static.setdefault(segment.key, Node())
+
+        for other, node in self.dynamic:
+            if other.key == segment.key:
+                return node
+
+        node = Node()
+        self.dynamic.append((segment, node))
+        self.dynamic.sort(key=lambda item: item[0].precedence)
+        return node
 
 
 class Router:
+    # Routes live in a trie keyed by path segment. Static segments always win
+    # over params, which are tried from the most to the least specific type
+
     def __init__(self):
-        self._paths: list[Route] = []
+        self._root = Node()
+        self._routes: list[Route] = []
+
+    @property
+    def routes(self) -> list[Route]:
+        return self._routes
 
     def add_route(self, method: Method, path: str, func: T_Func) -> None:
         self._add_route(Route(method, path, func))
 
     def _add_route(self, route: Route) -> None:
-        for other in self._paths:
-            if other.path == route.path:
-                other.methods.update(**route.methods)
-                break
+        node = self._root
+        for segment in route.segments:
+            node = node.child(segment)
+
+        if node.route is not None:
+            node.route.methods.update(**route.methods)
         else:
-            self._paths.append(route)
+            node.route = route
+            self._routes.append(route)
 
     def add_route_handler(self, handler: RouteHandler) -> None:
         for route in handler.__router__:
             self._add_route(route)
 
-    def get_path_handler(self, path: str) -> Route | None:
-        for route in self._paths:
-            if route.matches(path):
+    def match(self, path: str) -> tuple[Route, dict[str, Any]] | None:
+        values = []
+        route = self._match(self._root, utils.split_path(path), 0, values)
+        if route is None:
+            return None
+
+        params = {}
+        it = iter(values)
+        for segment in route.segments:
+            for name in segment.params:
+                params[name] = next(it)
+        return route, params
+
+    def _match(
+        self, node: Node, segments: list[str], index: int, values: list
+    ) -> Route | None:
+        if index == len(segments):
+            return node.route
+
+        segment = segments[index]
+        if (child := node.static.get(segment)) is not None:
+            route = self._match(child, segments, index + 1, values)
+            if route is not None:
+                return route
+
+        for dynamic, child in node.dynamic:
+            m = dynamic.pattern.fullmatch(segment)
+            if m is None:
+                continue
+
+            size = len(values)
+            values.extend(
+                cls(group) for group, cls in zip(m.groups(), dynamic.params.values())
+            )
+            route = self._match(child, segments, index + 1, values)
+            if route is not None:
                 return route
+            del values[size:]
+
+        return None
@@ -4,18 +4,16 @@ from logging import getLogger
 from typing import Callable, TYPE_CHECKING
 
 from PyQt6.QtCore import pyqtSignal, QObject
-from PyQt6.QtNetwork import QHostAddress, QTcpServer, QTcpSocket
+from PyQt6.QtNetwork import QHostAddress, QTcpServer
 
+from .batch import batch, MAX_BATCH_SIZE
+from .connection import HttpConnection
+from .encoding import MIN_COMPRESS_SIZE
+from .parser import MAX_BODY_SIZE, MAX_HEADER_SIZE
 from .router import Router
 from .request import HttpRequest, Method
-from .response import (
-    convert_response_to_http,
-    AsyncHttpResponse,
-    HttpResponse,
-    StatusCode,
-)
-from .sse import SSEResponse, SSEResponseHandler
-from .utils import pyqtSlot
+from .response import AsyncHttpResponse, HttpResponse, StatusCode
+from .sse import SSEResponse
 
 if TYPE_CHECKING:
     from .handler import RouteHandler
@@ -31,12 +29,18 @@ class QHttpServer(QObject):
         port: int,
         name: str | None = None,
         parent: QObject | None = None,
+        keep_alive_timeout: int = 15000,
     ) -> None:
         super().__init__(parent)
         self.name = name or "qhttpserver"
         self.address = address
         self._port = port
         self._is_restarting = False
+        self.keep_alive_timeout = keep_alive_timeout
+        self.max_header_size = MAX_HEADER_SIZE
+        self.max_body_size = MAX_BODY_SIZE
+        self.compression = True
+        self.compression_min_size = MIN_COMPRESS_SIZE
 
         self._server = QTcpServer(self)
         self._router = Router()
@@ -65,93 +69,27 @@ class QHttpServer(QObject):
         if client is None:
             return
 
-        client.readyRead.connect(self._data_received)
+        HttpConnection(self, client, self.keep_alive_timeout)
 
-    def _data_received(self) -> None:
-        client: QTcpSocket = self.sender()
-        try:
-            request = HttpRequest.from_raw_data(client.readAll().data())
-        except Exception as e:
-            self.logger.error("Failed to parse message", exc_info=e)
-            response = HttpResponse(status=StatusCode.BAD_REQUEST)
-            message = convert_response_to_http(response)
-            client.write(message)
-            return client.disconnectFromHost()
-
-        if request is None:
-            response = HttpResponse(status=StatusCode.BAD_REQUEST)
-            message = convert_response_to_http(response)
-            client.write(message)
-            return client.disconnectFromHost()
-
-        path = request.path
-        route = self._router.get_path_handler(path)
-
-        if route is None:
-            response = HttpResponse(status=StatusCode.NOT_FOUND)
-            return self._reply(client, request, response)
+    def _handle_request(
+        self, request: HttpRequest
+    ) -> HttpResponse | AsyncHttpResponse | SSEResponse:
+        match = self._router.match(request.path)
+        if match is None:
+            return HttpResponse(status=StatusCode.NOT_FOUND)
 
+        route, request.path_params = match
         func = route.methods.get(request.method)
         if func is None:
-            response = HttpResponse(status=StatusCode.METHOD_NOT_ALLOWED)
-            return self._reply(client, request, response)
-
-        if route.has_path_params:
-            request.path_params = route.get_params(path)
+            return HttpResponse(status=StatusCode.METHOD_NOT_ALLOWED)
 
         try:
-            response = func(request)
+            return func(request)
         except Exception as e:
             self.logger.exception(
                 f"Exception occurred while calling {func.__name__}", exc_info=e
             )
-            response = HttpResponse(status=StatusCode.INTERNAL_SERVER_ERROR)
-
-        if isinstance(response, AsyncHttpResponse):
-            response.setParent(self)
-            response._set_client(client)
-            response.finished.connect(self._reply)
-            response.error_occured.connect(self._async_response_error)
-            return
-
-        if isinstance(response, SSEResponse):
-            SSEResponseHandler(self, client, request, response)
-            return
-
-        return self._reply(client, request, response)
-
-    @pyqtSlot(getLogger(__name__))
-    def _reply(
-        self, client: QTcpSocket, request: HttpRequest, response: HttpResponse
-    ) -> None:
-        address, port, method, path, status = (
-            client.peerAddress().toString(),
-            client.peerPort(),
-            request.method,
-            request.path,
-            response.status,
-        )
-
-        log_message = (
-            f"{address}:{port} - {method} {path} HTTP/1.1 {status} {status.to_str()}"
-        )
-        getLogger(self.name).debug(log_message)
-
-        message = convert_response_to_http(response)
-        client.write(message)
-        client.disconnectFromHost()
-
-    def _async_response_error(self, error: Exception) -> None:
-        response: AsyncHttpResponse = self.sender()
-        self.logger.exception(
-            f"Exception occurred while calling {response.func.__name__}", exc_info=error
-        )
-
-        self._reply(
-            response._client,
-            response.request,
-            HttpResponse(status=StatusCode.INTERNAL_SERVER_ERROR),
-        )
+            return HttpResponse(status=StatusCode.INTERNAL_SERVER_ERROR)
 
     def get(self, path: str):
         self.logger.debug(f"Adding GET endpoint: {path}")
@@ -189,6 +127,11 @@ class QHttpServer(QObject):
 
         return wrapper
 
+    def add_batch_route(self, path: str, max_size: int = MAX_BATCH_SIZE) -> None:
+        # One POST carrying a list of {method, path, body} sub-requests, all of
+        # them answered together in a single json document
+        self.post(path)(batch(self, path, max_size))
+
     def add_route_handler(self, handler: RouteHandler) -> None:
         self.logger.debug(f"Adding Route Handler: {handler.__class__.__name__}")
         self._router.add_route_handler(handler)
@@ -213,6 +156,8 @@ class QHttpServer(QObject):
 
         self.logger.debug("Closing Yomu server...")
         self._server.close()
+        for connection in self.findChildren(HttpConnection):
+            connection.shutdown()
         self.logger.debug("Yomu server closed")
 
         if not self._is_restarting:
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from functools import partial
+from typing import Callable, Hashable
+
+from PyQt6.QtCore import pyqtSignal, QObject
+
+from .request import HttpRequest
+from .response import AsyncHttpResponse, HttpResponse, StreamingHttpResponse
+
+__all__ = ("SingleFlight",)
+
+
+class Flight(QObject):
+    finished = pyqtSignal(object)
+    error_occured = pyqtSignal(Exception)
+
+    def __init__(self, key: Hashable, parent: QObject) -> None:
+        super().__init__(parent)
+        self.key = key
+        self.waiters = 0
+
+
+def _shared_response(_, __, response: HttpResponse) -> HttpResponse:
+    return response
+
+
+class SingleFlight(QObject):
+    # Requests for the same key made while one is already in flight wait on it
+    # instead of doing the work again, every one of them gets the same response
+    # or error. Responses handed out this way are shared so they can't be
+    # streamed
+
+    def __init__(self, parent: QObject | None = None) -> None:
+        super().__init__(parent)
+        self._flights: dict[Hashable, Flight] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._flights),
+            "started": self.started,
+            "coalesced": self.coalesced,
+        }
+
+    def do(
+        self,
+        request: HttpRequest,
+        key: Hashable,
+        func: Callable[[], HttpResponse | AsyncHttpResponse],
+    ) -> HttpResponse | AsyncHttpResponse:
+        if (flight := self._flights.get(key)) is not None:
+            self.coalesced += 1
+            return self._wait(request, flight)
+
+        response = func()
+        if not isinstance(response, AsyncHttpResponse):
+            # Nothing to share when the answer is already there
+            return response
+
+        # The producer isn't tied to any one client, so the first request to
+        # disconnect doesn't take everyone else's response with it
+        self.started += 1
+        flight = self._flights[key] = Flight(key, self)
+        response.setParent(flight)
+        response.finished.connect(partial(self._finished, flight))
+        response.error_occured.connect(partial(self._error_occured, flight))
+        return self._wait(request, flight)
+
+    def _wait(self, request: HttpRequest, flight: Flight) -> AsyncHttpResponse:
+        flight.waiters += 1
+        response = AsyncHttpResponse(request, _shared_response)
+        flight.finished.connect(response.wait_for_signal)
+        flight.error_occured.connect(response.error_occured)
+        return response
+
+    def _land(self, flight: Flight) -> None:
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+        flight.deleteLater()
+
+    def _finished(self, flight: Flight, _, __, response: HttpResponse) -> None:
+        self._land(flight)
+        if isinstance(response, StreamingHttpResponse) and flight.waiters > 1:
+            response.close()
+            flight.error_occured.emit(
+                TypeError("Streamed responses can't be shared between requests")
+            )
+            return
+        flight.finished.emit(response)
+
+    def _error_occured(self, flight: Flight, error: Exception) -> None:
+        self._land(flight)
+        flight.error_occured.emit(error)
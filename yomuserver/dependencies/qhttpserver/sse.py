@@ -1,14 +1,141 @@
+from __future__ import annotations
+
+from collections import deque
+from itertools import islice
+import time
+
 from PyQt6.QtCore import pyqtSignal, QObject
 from PyQt6.QtNetwork import QTcpSocket
 from .request import HttpRequest
 
-__all__ = ("SSEResponse",)
+__all__ = ("SSEHub", "SSEResponse", "encode_event")
+
+# A subscriber that has this much queued up and unsent is dropped rather than
+# buffering for it forever
+MAX_BUFFERED = 1024 * 1024
+# How many of the latest events are kept around for clients that reconnect
+REPLAY_SIZE = 256
+# How long clients wait before reconnecting, in milliseconds
+RETRY = 3000
+
+
+def encode_event(event: str, data: str, id: int | None = None) -> bytes:
+    lines = "".join(f"data: {line}\r\n" for line in data.split("\n"))
+    head = f"id: {id}\r\n" if id is not None else ""
+    return f"{head}event: {event}\r\n{lines}\r\n".encode()
 
 
 class SSEResponse(QObject):
     event_occurred = pyqtSignal((str, str))
     finished = pyqtSignal()
 
+    def __init__(self, hub: SSEHub | None = None, group: str | None = None) -> None:
+        super().__init__()
+        self.hub = hub
+        self.group = group
+
+
+class SSEHub(QObject):
+    # One place events are published to, each is encoded once and the same
+    # bytes are written to every subscriber. Subscribers are added when their
+    # stream opens and removed as soon as their client disconnects.
+    #
+    # Events get increasing ids and the latest ones are kept, a client that
+    # reconnects with a Last-Event-ID still in there gets what it missed and
+    # any other is told to `resync` since it can't be caught up.
+    #
+    # An event published to a group only goes to the subscribers in it, the
+    # ones published without one go to everyone
+
+    def __init__(
+        self, parent: QObject | None = None, replay_size: int = REPLAY_SIZE
+    ) -> None:
+        super().__init__(parent)
+        self._subscribers: dict[SSEResponseHandler, None] = {}
+        # (id, encoded event, group), the ids in here are consecutive
+        self._events: deque[tuple[int, bytes, str | None]] = deque(
+            maxlen=replay_size
+        )
+        # Ids start from the clock, so an id from before a restart is always
+        # older than anything kept here and never mistaken for a recent one
+        self._last_id = time.time_ns() // 1_000_000
+        self.published = 0
+        self.dropped = 0
+        self.replayed = 0
+        self.resyncs = 0
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "dropped": self.dropped,
+            "replayed": self.replayed,
+            "resyncs": self.resyncs,
+            "last_id": self._last_id,
+        }
+
+    def subscribe(
+        self, _: HttpRequest | None = None, group: str | None = None
+    ) -> SSEResponse:
+        return SSEResponse(self, group)
+
+    def publish(self, event: str, data: str, group: str | None = None) -> None:
+        self.published += 1
+        self._last_id += 1
+        payload = encode_event(event, data, self._last_id)
+        self._events.append((self._last_id, payload, group))
+        if not self._subscribers:
+            return
+
+        for subscriber in list(self._subscribers):
+            if group is not None and subscriber.response.group != group:
+                continue
+            if subscriber.client.bytesToWrite() > MAX_BUFFERED:
+                self.dropped += 1
+                subscriber.client.abort()
+                continue
+            subscriber.client.write(payload)
+
+    def close(self) -> None:
+        for subscriber in list(self._subscribers):
+            subscriber.sse_finished()
+
+    def _add(self, subscriber: SSEResponseHandler) -> None:
+        self._subscribers[subscriber] = None
+
+        last_id = subscriber.request.get_header("Last-Event-ID")
+        if last_id is not None:
+            self._replay(subscriber, last_id)
+
+    def _replay(self, subscriber: SSEResponseHandler, last_id: str) -> None:
+        try:
+            last_id = int(last_id)
+        except ValueError:
+            last_id = None
+
+        if last_id == self._last_id:
+            return
+
+        oldest = self._events[0][0] if self._events else self._last_id + 1
+        if last_id is None or not oldest - 1 <= last_id < self._last_id:
+            # Too far behind or not one of ours, only a full reload helps now
+            self.resyncs += 1
+            subscriber.client.write(encode_event("resync", "{}", self._last_id))
+            return
+
+        missed = islice(self._events, last_id - oldest + 1, None)
+        for _, payload, group in missed:
+            if group is not None and subscriber.response.group != group:
+                continue
+            self.replayed += 1
+            subscriber.client.write(payload)
+
+    def _remove(self, subscriber: SSEResponseHandler) -> None:
+        self._subscribers.pop(subscriber, None)
+
 
 class SSEResponseHandler(QObject):
     def __init__(
@@ -21,7 +148,7 @@ class SSEResponseHandler(QObject):
         super().__init__(parent)
         self.request = request
         self.client = client
-        client.disconnected.connect(self.deleteLater)
+        client.disconnected.connect(self._disconnected)
 
         self.response = response
         response.setParent(self)
@@ -29,6 +156,8 @@ class SSEResponseHandler(QObject):
         response.finished.connect(self.sse_finished)
 
         self._send_initial_message()
+        if response.hub is not None:
+            response.hub._add(self)
 
     def _send_initial_message(self) -> None:
         self.client.write(
@@ -40,16 +169,23 @@ class SSEResponseHandler(QObject):
                 "Access-Control-Allow-Origin: *\r\n"
                 "Access-Control-Allow-Credentials: false\r\n"
                 "\r\n"
+                f"retry: {RETRY}\r\n"
+                "\r\n"
             ).encode()
         )
         self.client.flush()
         self.send_message("open", "connected")
 
     def send_message(self, event: str, message: str) -> None:
-        self.client.write(f"event: {event}\r\ndata: {message}\r\n\r\n".encode())
+        self.client.write(encode_event(event, message))
         self.client.flush()
 
     def sse_finished(self) -> None:
         self.client.write(b"event: done\r\ndata:{}\r\n\r\n")
         self.client.flush()
         self.client.disconnectFromHost()
+
+    def _disconnected(self) -> None:
+        if self.response.hub is not None:
+            self.response.hub._remove(self)
+        self.deleteLater()
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+from hashlib import blake2b
+import mimetypes
+import os
+import re
+
+from .conditional import http_date, is_not_modified, not_modified
+from .encoding import (
+    MIN_COMPRESS_SIZE,
+    compress,
+    is_compressible,
+    negotiate_encoding,
+)
+from .request import HttpRequest
+from .response import HttpResponse, StatusCode, StreamingHttpResponse
+
+__all__ = ("StaticFile", "StaticFiles", "file_response")
+
+# Bundler output like `index-D9SNt-lT.js` changes name whenever it changes
+HASHED_ASSET = re.compile(r"^[^-]+-[\w-]{8}\.(?:css|js|woff2?)$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+class StaticFile:
+    def __init__(self, path: str, data: bytes, mtime: float, immutable: bool) -> None:
+        self.path = path
+        self.data = data
+        self.mtime = mtime
+
+        self.content_type = (
+            mimetypes.guess_file_type(path)[0] or "application/octet-stream"
+        )
+        self.etag = f'"{blake2b(data, digest_size=12).hexdigest()}"'
+        self.last_modified = http_date(mtime)
+        self.cache_control = (
+            IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+        )
+        self.compressible = (
+            is_compressible(self.content_type) and len(data) >= MIN_COMPRESS_SIZE
+        )
+
+        self._encoded: dict[str, bytes] = {}
+
+    def encoded(self, encoding: str) -> bytes:
+        if (data := self._encoded.get(encoding)) is None:
+            data = self._encoded[encoding] = compress(self.data, encoding, level=9)
+        return data
+
+
+class StaticFiles:
+    # Files are read into memory once along with everything needed to answer
+    # conditional requests for them. With `check_mtime` each lookup stats the
+    # file and reloads it if it changed, otherwise call `reload`
+
+    def __init__(
+        self,
+        root: str,
+        check_mtime: bool = False,
+        immutable: re.Pattern | None = HASHED_ASSET,
+    ) -> None:
+        self.root = os.path.abspath(root)
+        self.check_mtime = check_mtime
+        self.immutable = immutable
+
+        self._files: dict[str, StaticFile | None] = {}
+        self.reload()
+
+    def reload(self) -> None:
+        self._files.clear()
+        for directory, _, files in os.walk(self.root):
+            for file in files:
+                path = os.path.relpath(os.path.join(directory, file), self.root)
+                self._files[path.replace(os.sep, "/")] = self._load(path)
+
+    def _resolve(self, path: str) -> str | None:
+        path = os.path.normpath(path.lstrip("/"))
+        if path.startswith("..") or os.path.isabs(path):
+            return None
+        return path.replace(os.sep, "/")
+
+    def _load(self, path: str) -> StaticFile | None:
+        full_path = os.path.join(self.root, path)
+        try:
+            with open(full_path, "rb") as f:
+                mtime = os.fstat(f.fileno()).st_mtime
+                data = f.read()
+        except OSError:
+            return None
+
+        immutable = self.immutable is not None and bool(
+            self.immutable.match(os.path.basename(path))
+        )
+        return StaticFile(full_path, data, mtime, immutable)
+
+    def get(self, path: str) -> StaticFile | None:
+        if (path := self._resolve(path)) is None:
+            return None
+
+        if path not in self._files:
+            # Only files that showed up after the last reload end up here
+            if not self.check_mtime:
+                return None
+            self._files[path] = self._load(path)
+
+        file = self._files[path]
+        if self.check_mtime:
+            try:
+                mtime = os.stat(os.path.join(self.root, path)).st_mtime
+            except OSError:
+                mtime = None
+            if file is None or mtime != file.mtime:
+                file = self._files[path] = self._load(path)
+
+        return file
+
+    def response(self, request: HttpRequest, path: str) -> HttpResponse:
+        file = self.get(path)
+        if file is None:
+            return HttpResponse(StatusCode.NOT_FOUND)
+
+        headers = {
+            "Content-Type": file.content_type,
+            "Cache-Control": file.cache_control,
+            "Last-Modified": file.last_modified,
+        }
+
+        body, etag = file.data, file.etag
+        if file.compressible:
+            headers["Vary"] = "Accept-Encoding"
+            if (encoding := negotiate_encoding(request)) is not None:
+                body = file.encoded(encoding)
+                etag = f'{file.etag[:-1]}-{encoding}"'
+                headers["Content-Encoding"] = encoding
+        headers["ETag"] = etag
+
+        if is_not_modified(request, etag, file.mtime):
+            return not_modified(headers)
+        return HttpResponse(headers=headers, body=body)
+
+
+def file_response(
+    request: HttpRequest,
+    path: str,
+    content_type: str | None = None,
+    cache_control: str = REVALIDATE_CACHE_CONTROL,
+) -> HttpResponse:
+    # Streams a file that is too big or changes too often to be kept in memory
+    # like StaticFiles does, it is read in chunks as the socket drains
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return HttpResponse(StatusCode.NOT_FOUND)
+
+    stat = os.fstat(f.fileno())
+    headers = {
+        "Content-Type": content_type
+        or mimetypes.guess_file_type(path)[0]
+        or "application/octet-stream",
+        "Cache-Control": cache_control,
+        "Last-Modified": http_date(stat.st_mtime),
+        "ETag": f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"',
+    }
+
+    if is_not_modified(request, headers["ETag"], stat.st_mtime):
+        f.close()
+        return not_modified(headers)
+    return StreamingHttpResponse(headers=headers, body=f, content_length=stat.st_size)
@@ -4,28 +4,68 @@ from typing import Callable
 import re
 
 MATCH = re.compile(r"<([a-zA-Z_]+):?([a-zA-Z]+)?>")
-TYPES = {"int": (r"(\d+)", int), "float": (r"(\d+\.\d+)", float)}
+TYPES = {"int": (r"\d+", int), "float": (r"\d+\.\d+", float)}
+DEFAULT_TYPE = (r"[\w_.-]+", str)
 
+# Params that can match fewer segments are tried first, `str` matches nearly
+# anything so it always goes last
+PRECEDENCE = {int: 0, float: 1, str: 3}
+MIXED_PRECEDENCE = 2
 
-def check_regex(path: str) -> tuple[bool, str, dict]:
+
+class Segment:
+    def __init__(
+        self, key: str, pattern: re.Pattern | None, params: dict, precedence: int
+    ) -> None:
+        self.key = key
+        self.pattern = pattern
+        self.params = params
+        self.precedence = precedence
+
+
+def split_path(path: str) -> list[str]:
+    return path.strip("/").split("/")
+
+
+def compile_segment(segment: str) -> Segment:
     params = {}
-    new_path = path
+    key = pattern = ""
 
-    offset = 0
-    for m in MATCH.finditer(path):
+    last = 0
+    for m in MATCH.finditer(segment):
         name, group_type = m.groups()
-        pattern, cls = TYPES.get(group_type, (r"([\w_.-]+)", str))
+        regex, cls = TYPES.get(group_type, DEFAULT_TYPE)
         params[name] = cls
 
-        start, end = m.start(), m.end()
-        new_path = new_path[: start + offset] + pattern + new_path[end + offset :]
+        literal = segment[last : m.start()]
+        key += f"{literal}<{cls.__name__}>"
+        pattern += f"{re.escape(literal)}({regex})"
+        last = m.end()
+
+    if not params:
+        return Segment(segment, None, params, -1)
+
+    literal = segment[last:]
+    key += literal
+    pattern += re.escape(literal)
+
+    if len(params) == 1 and key == f"<{cls.__name__}>":
+        precedence = PRECEDENCE[cls]
+    else:
+        precedence = MIXED_PRECEDENCE
+    return Segment(key, re.compile(pattern), params, precedence)
+
 
-        offset += len(pattern) - len(path[start:end])
+def compile_path(path: str) -> list[Segment]:
+    return [compile_segment(segment) for segment in split_path(path)]
 
-    new_path += r"?" if new_path.endswith("/") else "/?"
-    new_path = f"^{new_path}$"
 
-    return bool(params), new_path, params
+def get_header(headers: dict, name: str) -> str | None:
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
 
 
 def pyqtSlot(logger: Logger | None = None):
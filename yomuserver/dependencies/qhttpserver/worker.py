@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from typing import Any, Callable
+
+from PyQt6.QtCore import pyqtSignal, QObject, QRunnable, QThreadPool
+
+__all__ = ("WorkerPool", "WorkerTask")
+
+
+class WorkerTask(QObject):
+    # Emitted from the worker thread, receivers living on the main thread get
+    # them through the event loop like any other queued signal. Tasks don't run
+    # until `start` is called, a quick one could otherwise emit before anything
+    # was connected to it
+    finished = pyqtSignal(object)
+    error_occured = pyqtSignal(Exception)
+
+    def __init__(self, pool: QThreadPool, priority: int, parent: QObject) -> None:
+        super().__init__(parent)
+        self._pool = pool
+        self._priority = priority
+        self._worker: Worker | None = None
+
+    def start(self) -> None:
+        worker, self._worker = self._worker, None
+        if worker is not None:
+            self._pool.start(worker, self._priority)
+
+
+class Worker(QRunnable):
+    def __init__(
+        self, task: WorkerTask, func: Callable, args: tuple, kwargs: dict
+    ) -> None:
+        super().__init__()
+        self.task = task
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self) -> None:
+        try:
+            result = self.func(*self.args, **self.kwargs)
+        except Exception as e:
+            return self.task.error_occured.emit(e)
+        self.task.finished.emit(result)
+
+
+class WorkerPool(QObject):
+    # Runs CPU bound work off the event loop. Whatever is submitted must not
+    # touch objects owned by the main thread
+
+    def __init__(self, max_workers: int | None = None, parent: QObject | None = None):
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        if max_workers:
+            self._pool.setMaxThreadCount(max_workers)
+
+    @property
+    def max_workers(self) -> int:
+        return self._pool.maxThreadCount()
+
+    @max_workers.setter
+    def max_workers(self, max_workers: int) -> None:
+        self._pool.setMaxThreadCount(max_workers)
+
+    def create(
+        self, func: Callable, *args: Any, priority: int = 0, **kwargs: Any
+    ) -> WorkerTask:
+        # Connect to the task, then `start` it
+        task = WorkerTask(self._pool, priority, self)
+        task.finished.connect(task.deleteLater)
+        task.error_occured.connect(task.deleteLater)
+        task._worker = Worker(task, func, args, kwargs)
+        return task
+
+    def wait_for_done(self, msecs: int = -1) -> bool:
+        return self._pool.waitForDone(msecs)
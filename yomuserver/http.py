@@ -1,12 +1,16 @@
 from __future__ import annotations
 
+import os
 from typing import TYPE_CHECKING
 
-from PyQt6.QtCore import pyqtSignal, QObject
+from PyQt6.QtCore import pyqtSignal, QObject, QStandardPaths
 from PyQt6.QtNetwork import QHostAddress
 
-from qhttpserver import QHttpServer
+from qhttpserver import QHttpServer, SingleFlight, WorkerPool
+from .cache import CategoryIndex, ModelCache, PageCache, StaleCache
+from .versions import Versions
 from .routes import *
+from .routes.utils import convert_chapter_to_json, convert_manga_to_json
 
 if TYPE_CHECKING:
     from .core import YomuServerExtension
@@ -20,26 +24,103 @@ class HttpServer(QObject):
         super().__init__(ext)
 
         address = QHostAddress(QHostAddress.SpecialAddress.AnyIPv4)
-        self._server = QHttpServer(address, port, "yomuserver", self)
+        keep_alive_timeout = ext.settings.get("keep_alive_timeout", 15) * 1000
+        self._server = QHttpServer(
+            address, port, "yomuserver", self, keep_alive_timeout=keep_alive_timeout
+        )
 
         app = ext.app
+        workers = WorkerPool(ext.settings.get("worker_threads", 0) or None, self)
+        flights = SingleFlight(self)
+        versions = Versions(app)
+        categories = CategoryIndex(app)
+        models = ModelCache(
+            app,
+            convert_manga_to_json,
+            convert_chapter_to_json,
+            ext.settings.get("model_cache_size", 1024),
+        )
+
+        cache_dir = QStandardPaths.writableLocation(
+            QStandardPaths.StandardLocation.CacheLocation
+        )
+        self.page_cache = PageCache(
+            os.path.join(cache_dir, "yomuserver", "pages"),
+            ext.settings.get("page_cache_size", 512) * 1024 * 1024,
+            self,
+        )
+        app.aboutToQuit.connect(self.page_cache.save)
+
+        manga_lists = StaleCache(
+            ext.settings.get("source_cache_ttl", 300),
+            ext.settings.get("source_cache_max_age", 3600),
+        )
+        sources = SourceHandler(
+            app.network,
+            app.source_manager,
+            app.sql,
+            flights,
+            manga_lists,
+            versions,
+            ext.settings.get("source_prefetch_next", True),
+        )
+        app.source_filters_updated.connect(sources.source_filters_updated)
 
         # API Routes
-        self._server.add_route_handler(LibraryHandler(app.sql))
-        self._server.add_route_handler(CategoryHandler(app.sql))
+        self._server.add_route_handler(LibraryHandler(app.sql, models, versions))
+        self._server.add_route_handler(
+            CategoryHandler(app.sql, categories, models, versions)
+        )
+        self._server.add_route_handler(sources)
         self._server.add_route_handler(
-            SourceHandler(app.network, app.source_manager, app.sql)
+            MangaHandler(
+                app.network,
+                app.downloader,
+                app.sql,
+                models,
+                app.updater,
+                workers,
+                flights,
+                versions,
+            )
+        )
+        chapters = ChapterHandler(
+            app.network,
+            app.sql,
+            models,
+            workers,
+            flights,
+            self.page_cache,
+            ext.settings.get("prefetch_depth", 3),
+            ext.settings.get("page_list_ttl", 6 * 60 * 60),
         )
+        self._server.add_route_handler(chapters)
+        events = YomuEventHandler(app, ext.settings.get("sse_replay_size", 256))
         self._server.add_route_handler(
-            MangaHandler(app.network, app.downloader, app.sql, app.updater)
+            StatsHandler(
+                {
+                    "categories": categories.stats,
+                    "manifests": chapters.manifests.stats,
+                    "models": models.stats,
+                    "page_cache": self.page_cache.stats,
+                    "prefetch": chapters.prefetcher.stats,
+                    "single_flight": flights.stats,
+                    "sse": events.hub.stats,
+                    "source_lists": manga_lists.stats,
+                }
+            )
+        )
+        self._server.get("/api/sse")(events.subscribe)
+        self._server.add_batch_route(
+            "/api/batch", ext.settings.get("batch_max_size", 20)
         )
-        self._server.add_route_handler(ChapterHandler(app.network, app.sql))
-        self._server.get("/api/sse")(sse(app))
 
         # Non API Routes
         self._server.add_route_handler(WebPageHandler())
 
+        self._server.started.connect(categories.verify)
         self._server.started.connect(self.started.emit)
+        self._server.closed.connect(events.hub.close)
         self._server.closed.connect(self.closed.emit)
 
     def run(self) -> None:
@@ -3,5 +3,6 @@ from .categories import CategoryHandler
 from .mangas import MangaHandler
 from .sources import SourceHandler
 from .chapters import ChapterHandler
+from .stats import StatsHandler
 from .web import WebPageHandler
-from .sse import sse
+from .sse import YomuEventHandler
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from functools import partial
 from typing import TYPE_CHECKING
 
 from qhttpserver import (
@@ -12,21 +13,40 @@ from qhttpserver import (
     delete,
 )
 
+from ..versions import CATEGORIES, CATEGORY_MANGAS
+from .listing import ListQuery, MANGA_FIELDS, MANGA_SORT_FIELDS
 from .utils import convert_category_to_json, convert_manga_to_json
 
 if TYPE_CHECKING:
     from yomu.core.sql import Sql
 
+    from ..cache import CategoryIndex, ModelCache
+    from ..versions import Versions
+
 
 class CategoryHandler(RouteHandler):
     BASE_PATH = "/api/category"
 
-    def __init__(self, sql: Sql):
+    def __init__(
+        self,
+        sql: Sql,
+        categories: CategoryIndex,
+        models: ModelCache,
+        versions: Versions,
+    ):
         super().__init__()
         self.sql = sql
+        self.categories = categories
+        self.models = models
+        self.versions = versions
 
     @get("/")
     def get_categories(self, request: HttpRequest):
+        return self.versions.response(
+            request, (CATEGORIES,), self._categories_response
+        )
+
+    def _categories_response(self):
         categories = self.sql.get_categories()
         return HttpResponse(json=list(map(convert_category_to_json, categories)))
 
@@ -44,10 +64,8 @@ class CategoryHandler(RouteHandler):
     @delete("/<id:int>/")
     def delete_category(self, request: HttpRequest):
         category_id = request.path_params["id"]
-        for category in self.sql.get_categories():
-            if category.id == category_id:
-                break
-        else:
+        category = self.categories.get(category_id)
+        if category is None:
             return HttpResponse(status=StatusCode.NOT_FOUND)
 
         if self.sql.delete_category(category) is None:
@@ -56,30 +74,34 @@ class CategoryHandler(RouteHandler):
 
     @get("/<id:int>/mangas")
     def get_category_mangas(self, request: HttpRequest):
-        category_id = request.path_params["id"]
-        for category in self.sql.get_categories():
-            if category.id == category_id:
-                break
-        else:
+        query = ListQuery.from_request(request, MANGA_FIELDS, MANGA_SORT_FIELDS)
+        if query is None:
+            return HttpResponse(status=StatusCode.BAD_REQUEST)
+
+        return self.versions.response(
+            request,
+            (CATEGORIES, CATEGORY_MANGAS),
+            partial(self._category_mangas_response, request.path_params["id"], query),
+        )
+
+    def _category_mangas_response(self, category_id: int, query: ListQuery):
+        category = self.categories.get(category_id)
+        if category is None:
             return HttpResponse(status=StatusCode.NOT_FOUND)
 
         mangas = self.sql.get_category_mangas(category)
-        return HttpResponse(
-            status=StatusCode.OK, json=list(map(convert_manga_to_json, mangas))
-        )
+        return query.response(mangas, convert_manga_to_json)
 
     @post("/<category_id:int>/manga/<manga_id:int>/")
     def add_manga_to_category(self, request: HttpRequest):
         params = request.path_params
 
         category_id = params.get("category_id")
-        for category in self.sql.get_categories():
-            if category.id == category_id:
-                break
-        else:
+        category = self.categories.get(category_id)
+        if category is None:
             return HttpResponse(status=StatusCode.NOT_FOUND)
 
-        manga = self.sql.get_manga_by_id(params.get("manga_id"))
+        manga = self.models.get_manga(params.get("manga_id"))
         if manga is None:
             return HttpResponse(status=StatusCode.NOT_FOUND)
         if not manga.library:
@@ -94,13 +116,11 @@ class CategoryHandler(RouteHandler):
         params = request.path_params
 
         category_id = params.get("category_id")
-        for category in self.sql.get_categories():
-            if category.id == category_id:
-                break
-        else:
+        category = self.categories.get(category_id)
+        if category is None:
             return HttpResponse(status=StatusCode.NOT_FOUND)
 
-        manga = self.sql.get_manga_by_id(params.get("manga_id"))
+        manga = self.models.get_manga(params.get("manga_id"))
         if manga is None:
             return HttpResponse(StatusCode.NOT_FOUND)
         if not manga.library:
@@ -1,13 +1,10 @@
 from __future__ import annotations
 
-import os
+import time
+from functools import partial
 from typing import TYPE_CHECKING
 
-from PyQt6.QtCore import QBuffer, Qt, QUrl
-from PyQt6.QtGui import QImage
-
 from yomu.core.network import Response, Request
-from yomu.core.downloader import Downloader
 from yomu.source.models import Page as SourcePage
 
 from qhttpserver import (
@@ -17,10 +14,15 @@ from qhttpserver import (
     HttpResponse,
     HttpRequest,
     RouteHandler,
+    SingleFlight,
     StatusCode,
+    WorkerPool,
+    file_response,
 )
 
-from .utils import convert_chapter_to_json
+from .images import render_file, render_image, sniff_file, to_bytes, ImageVariant
+from .manifest import ChapterManifest, ManifestCache, ManifestScan
+from .prefetch import PagePrefetcher
 
 if TYPE_CHECKING:
     from yomu.core.models import Chapter
@@ -28,14 +30,42 @@ if TYPE_CHECKING:
     from yomu.core.sql import Sql
     from yomu.source import Source
 
+    from ..cache import ModelCache, PageCache
+
+MAX_BULK_CHAPTERS = 5000
+# Ids bound per query, older SQLite builds allow at most 999 parameters
+MAX_QUERY_IDS = 500
+
+
+def _is_int(value) -> bool:
+    # json booleans come out as bools, which are ints too
+    return isinstance(value, int) and not isinstance(value, bool)
+
 
 class ChapterHandler(RouteHandler):
     BASE_PATH = "/api/chapter"
 
-    def __init__(self, network: Network, sql: Sql) -> None:
+    def __init__(
+        self,
+        network: Network,
+        sql: Sql,
+        models: ModelCache,
+        workers: WorkerPool,
+        flights: SingleFlight,
+        page_cache: PageCache,
+        prefetch_depth: int = 3,
+        page_list_ttl: int = 6 * 60 * 60,
+    ) -> None:
         super().__init__()
         self.network = network
         self.sql = sql
+        self.models = models
+        self.workers = workers
+        self.flights = flights
+        self.page_cache = page_cache
+        self.page_list_ttl = page_list_ttl
+        self.manifests = ManifestCache(workers)
+        self.prefetcher = PagePrefetcher(self, prefetch_depth)
 
         query = self.sql.create_query()
         query.exec(
@@ -45,9 +75,19 @@ class ChapterHandler(RouteHandler):
                                                  PRIMARY KEY(chapter_id, number),
                                                  FOREIGN KEY(chapter_id) REFERENCES chapters(id) ON DELETE CASCADE);"""
         )
+        # When each chapter's page list was last fetched from its source. The
+        # primary key of `pages` already covers lookups by chapter_id
+        query.exec(
+            """CREATE TABLE IF NOT EXISTS page_lists (
+                   chapter_id INTEGER PRIMARY KEY,
+                   page_count INTEGER NOT NULL,
+                   fetched_at INTEGER NOT NULL,
+                   FOREIGN KEY(chapter_id) REFERENCES chapters(id) ON DELETE CASCADE
+               );"""
+        )
 
     def mark_read_status(self, id: int, read: bool) -> bool:
-        chapter = self.sql.get_chapter_by_id(id)
+        chapter = self.models.get_chapter(id)
         if chapter is None:
             return False
 
@@ -56,10 +96,10 @@ class ChapterHandler(RouteHandler):
 
     @get("/<id:int>")
     def get_chapter(self, request: HttpRequest):
-        chapter = self.sql.get_chapter_by_id(request.path_params["id"])
+        chapter = self.models.get_chapter(request.path_params["id"])
         if chapter is None:
             return HttpResponse(status=StatusCode.INTERNAL_SERVER_ERROR)
-        return HttpResponse(json=convert_chapter_to_json(chapter))
+        return HttpResponse(json=self.models.chapter_json(chapter))
 
     @post("/<id:int>/read")
     def mark_chapter_as_read(self, request: HttpRequest):
@@ -75,17 +115,113 @@ class ChapterHandler(RouteHandler):
             return HttpResponse(status=StatusCode.INTERNAL_SERVER_ERROR)
         return HttpResponse()
 
+    @post("/read")
+    def mark_chapters_as_read(self, request: HttpRequest):
+        return self.mark_bulk_read_status(request, True)
+
+    @post("/unread")
+    def mark_chapters_as_unread(self, request: HttpRequest):
+        return self.mark_bulk_read_status(request, False)
+
+    def mark_bulk_read_status(self, request: HttpRequest, read: bool):
+        # {"ids": [...]}, {"manga": id} or {"manga": id, "up_to": number}
+        body = request.json()
+        if not isinstance(body, dict):
+            return HttpResponse(status=StatusCode.BAD_REQUEST)
+
+        if "ids" in body:
+            ids = body["ids"]
+            if not isinstance(ids, list) or not all(map(_is_int, ids)):
+                return HttpResponse(status=StatusCode.BAD_REQUEST)
+            if len(ids) > MAX_BULK_CHAPTERS:
+                return HttpResponse(status=StatusCode.PAYLOAD_TOO_LARGE)
+
+            chapters = self.get_chapters_by_ids(set(ids))
+            if chapters is None:
+                return HttpResponse(status=StatusCode.INTERNAL_SERVER_ERROR)
+        elif _is_int(body.get("manga")):
+            up_to = body.get("up_to")
+            if up_to is not None and (
+                isinstance(up_to, bool) or not isinstance(up_to, (int, float))
+            ):
+                return HttpResponse(status=StatusCode.BAD_REQUEST)
+
+            manga = self.models.get_manga(body["manga"])
+            if manga is None:
+                return HttpResponse(status=StatusCode.NOT_FOUND)
+
+            chapters = self.sql.get_chapters(manga)
+            if up_to is not None:
+                chapters = [chapter for chapter in chapters if chapter.number <= up_to]
+        else:
+            return HttpResponse(status=StatusCode.BAD_REQUEST)
+
+        # Chapters already in that state would only mean more writes and events
+        chapters = [chapter for chapter in chapters if chapter.read != read]
+        if chapters:
+            self.sql.mark_chapters_read_status(chapters, read=read)
+        return HttpResponse(json={"updated": len(chapters)})
+
+    def get_chapters_by_ids(self, ids: set[int]) -> list[Chapter] | None:
+        if not ids:
+            return []
+
+        # A query per few hundred ids rather than a lookup each, the models come
+        # from the chapter lists of the mangas they belong to, which is usually
+        # just the one
+        manga_ids = set()
+        ordered = list(ids)
+        for i in range(0, len(ordered), MAX_QUERY_IDS):
+            batch = ordered[i : i + MAX_QUERY_IDS]
+            query = self.sql.create_query()
+            query.prepare(
+                "SELECT DISTINCT manga_id FROM chapters WHERE id IN "
+                f"({', '.join('?' * len(batch))})"
+            )
+            for id in batch:
+                query.addBindValue(id)
+            if not query.exec():
+                return None
+
+            while query.next():
+                manga_ids.add(query.value("manga_id"))
+
+        chapters = []
+        for manga_id in manga_ids:
+            if (manga := self.models.get_manga(manga_id)) is not None:
+                chapters.extend(
+                    chapter
+                    for chapter in self.sql.get_chapters(manga)
+                    if chapter.id in ids
+                )
+        return chapters
+
     @get("/<id:int>/pages")
     def get_chapter_pages(self, request: HttpRequest):
-        chapter = self.sql.get_chapter_by_id(request.path_params["id"])
+        chapter = self.models.get_chapter(request.path_params["id"])
         if chapter is None:
             return HttpResponse(status=StatusCode.NOT_FOUND)
 
         if chapter.downloaded:
-            return HttpResponse(
-                json={"pages": len(os.listdir(Downloader.resolve_path(chapter)))}
-            )
+            manifest = self.manifests.get(chapter)
+            if isinstance(manifest, ManifestScan):
+                server_response = AsyncHttpResponse(request, self._local_page_count)
+                manifest.finished.connect(server_response.wait_for_signal)
+                manifest.error_occured.connect(server_response.error_occured)
+                return server_response
+            return self._local_page_count(request, None, manifest)
+
+        refresh = request.query_params.get("refresh", ["0"])[0] in ("1", "true")
+        if not refresh and (page_count := self.stored_page_count(chapter)) is not None:
+            return HttpResponse(json={"pages": page_count})
+
+        return self.flights.do(
+            request,
+            ("pages", chapter.id),
+            partial(self._load_chapter_pages, request, chapter),
+        )
 
+    def _load_chapter_pages(self, request: HttpRequest, chapter: Chapter):
         r = chapter.source.get_chapter_pages(chapter)
         r.setPriority(Request.Priority.HighPriority)
         response = self.network.handle_request(r)
@@ -97,8 +233,64 @@ class ChapterHandler(RouteHandler):
         return server_response
 
     def _chapter_pages_received(self, _, response: Response, chapter: Chapter):
+        page_count = self.store_pages(response, chapter)
+        if page_count is None:
+            return HttpResponse(status=StatusCode.INTERNAL_SERVER_ERROR)
+        return HttpResponse(json={"pages": page_count})
+
+    def _local_page_count(self, _, __, manifest: ChapterManifest | None):
+        if manifest is None:
+            return HttpResponse(status=StatusCode.NOT_FOUND)
+        return HttpResponse(json={"pages": manifest.page_count})
+
+    def stored_page_count(self, chapter: Chapter) -> int | None:
+        # Page lists fetched within `page_list_ttl` are trusted over the source
+        query = self.sql.create_query()
+        query.prepare(
+            """SELECT page_count FROM page_lists
+               WHERE chapter_id = :chapter_id AND fetched_at >= :fetched_after"""
+        )
+        query.bindValue(":chapter_id", chapter.id)
+        query.bindValue(":fetched_after", int(time.time()) - self.page_list_ttl)
+        if not query.exec() or not query.first():
+            return None
+        return query.value("page_count")
+
+    def expire_page_list(self, chapter_id: int) -> None:
+        query = self.sql.create_query()
+        query.prepare(
+            "UPDATE page_lists SET fetched_at = 0 WHERE chapter_id = :chapter_id"
+        )
+        query.bindValue(":chapter_id", chapter_id)
+        query.exec()
+
+    def page_failed(self, response: Response, chapter_id: int) -> None:
+        # The stored url may have expired, the list is fetched again next time
+        if response.error() != Response.Error.OperationCanceledError:
+            self.expire_page_list(chapter_id)
+
+    def store_pages(self, response: Response, chapter: Chapter) -> int | None:
         pages = chapter.source.parse_chapter_pages(response, chapter)
         page_count = len(pages)
+        urls = [page.url for page in sorted(pages, key=lambda page: page.number)]
+
+        # Rendered pages of a chapter whose images moved can't be trusted anymore
+        query = self.sql.create_query()
+        query.prepare("SELECT number, url FROM pages WHERE chapter_id = :chapter_id")
+        query.bindValue(":chapter_id", chapter.id)
+        if query.exec():
+            while query.next():
+                number = query.value("number")
+                if number >= page_count or query.value("url") != urls[number]:
+                    self.page_cache.discard_page(chapter.id, number)
+
+        query = self.sql.create_query()
+        query.prepare(
+            "DELETE FROM pages WHERE chapter_id = :chapter_id AND number >= :count"
+        )
+        query.bindValue(":chapter_id", chapter.id)
+        query.bindValue(":count", page_count)
+        query.exec()
 
         query = self.sql.create_query()
         query.prepare(
@@ -109,83 +301,185 @@ class ChapterHandler(RouteHandler):
         )
         query.addBindValue([chapter.id] * page_count)
         query.addBindValue(list(range(page_count)))
-        query.addBindValue(
-            [page.url for page in sorted(pages, key=lambda page: page.number)]
-        )
+        query.addBindValue(urls)
         if not query.execBatch():
-            return HttpResponse(status=StatusCode.INTERNAL_SERVER_ERROR)
+            return None
 
-        return HttpResponse(json={"pages": page_count})
+        query = self.sql.create_query()
+        query.prepare(
+            """INSERT OR REPLACE INTO page_lists
+               VALUES (:chapter_id, :page_count, :fetched_at)"""
+        )
+        query.bindValue(":chapter_id", chapter.id)
+        query.bindValue(":page_count", page_count)
+        query.bindValue(":fetched_at", int(time.time()))
+        query.exec()
+        return page_count
 
     @get("/<id:int>/page/<index:int>")
     def load_images(self, request: HttpRequest):
-        chapter = self.sql.get_chapter_by_id(request.path_params["id"])
+        chapter = self.models.get_chapter(request.path_params["id"])
         if chapter is None:
             return HttpResponse(status=StatusCode.NOT_FOUND)
 
-        source = chapter.source
         index: int = request.path_params["index"]
 
-        if chapter.downloaded:
-            page = None
-            r = Request(
-                QUrl.fromLocalFile(
-                    os.path.join(Downloader.resolve_path(chapter), f"{index}.png")
-                )
+        variant = ImageVariant.from_request(request)
+        if variant is None:
+            return HttpResponse(status=StatusCode.BAD_REQUEST)
+
+        params = variant.params
+        data = self.page_cache.get(chapter.id, index, params)
+        if data is not None:
+            self.prefetcher.page_served(chapter.id, index, params)
+            self.prefetcher.prefetch(chapter, index, variant)
+            return HttpResponse(headers=variant.headers(data), body=data)
+
+        if (job := self.prefetcher.job(chapter.id, index, params)) is not None:
+            server_response = AsyncHttpResponse(request, self._page_rendered, variant)
+            job.finished.connect(
+                lambda _: self.prefetcher.page_served(chapter.id, index, params)
             )
+            job.finished.connect(server_response.wait_for_signal)
+            self.prefetcher.prefetch(chapter, index, variant)
+            return server_response
+
+        if chapter.downloaded and variant.original:
+            # Streamed from the file, a stream can't be shared between requests
+            server_response = self._load_local_page(request, chapter, index, variant)
         else:
-            query = self.sql.create_query()
-            query.prepare(
-                "SELECT url FROM pages WHERE chapter_id = :chapter_id AND number = :number"
+            server_response = self.flights.do(
+                request,
+                ("page", chapter.id, index, params),
+                partial(self._load_page, request, chapter, index, variant),
             )
-            query.bindValue(":chapter_id", chapter.id)
-            query.bindValue(":number", index)
-            if not query.exec() or not query.first():
-                return HttpResponse(status=StatusCode.NOT_FOUND)
+        self.prefetcher.prefetch(chapter, index, variant)
+        return server_response
+
+    def _load_page(
+        self, request: HttpRequest, chapter: Chapter, index: int, variant: ImageVariant
+    ):
+        if chapter.downloaded:
+            return self._load_local_page(request, chapter, index, variant)
 
-            page = SourcePage(number=0, url=query.value("url"))
-            r = source.get_page(page)
-            r.setPriority(Request.Priority.HighPriority)
+        page_request = self.page_request(chapter, index)
+        if page_request is None:
+            return HttpResponse(status=StatusCode.NOT_FOUND)
 
+        r, page = page_request
+        r.setPriority(Request.Priority.HighPriority)
         response = self.network.handle_request(r)
+
         server_response = AsyncHttpResponse(
-            request, self._page_image_received, source, page
+            request, self._page_image_received, chapter, page, index, variant
         )
         response.finished.connect(server_response.wait_for_signal)
         return server_response
 
-    def _page_image_received(
-        self, _, response: Response, source: Source, page: SourcePage | None
+    def _load_local_page(
+        self, request: HttpRequest, chapter: Chapter, index: int, variant: ImageVariant
+    ):
+        manifest = self.manifests.get(chapter)
+        if isinstance(manifest, ManifestScan):
+            server_response = AsyncHttpResponse(
+                request, self._local_page_listed, chapter, index, variant
+            )
+            manifest.finished.connect(server_response.wait_for_signal)
+            manifest.error_occured.connect(server_response.error_occured)
+            return server_response
+        return self._local_page_listed(request, None, manifest, chapter, index, variant)
+
+    def _local_page_listed(
+        self,
+        request: HttpRequest,
+        _,
+        manifest: ChapterManifest | None,
+        chapter: Chapter,
+        index: int,
+        variant: ImageVariant,
     ):
+        page = manifest.pages.get(index) if manifest is not None else None
+        if page is None:
+            return HttpResponse(status=StatusCode.NOT_FOUND)
+        if variant.original:
+            return file_response(request, page.path, sniff_file(page.path))
+
+        # Read off the disk without going through the network stack
+        task = self.workers.create(render_file, page.path, variant)
+        server_response = AsyncHttpResponse(
+            request, self._page_rendered, variant, (chapter.id, index)
+        )
+        task.finished.connect(server_response.wait_for_signal)
+        task.error_occured.connect(server_response.error_occured)
+        task.start()
+        return server_response
+
+    def page_request(
+        self, chapter: Chapter, index: int
+    ) -> tuple[Request, SourcePage] | None:
+        query = self.sql.create_query()
+        query.prepare(
+            "SELECT url FROM pages WHERE chapter_id = :chapter_id AND number = :number"
+        )
+        query.bindValue(":chapter_id", chapter.id)
+        query.bindValue(":number", index)
+        if not query.exec() or not query.first():
+            return None
+
+        page = SourcePage(number=0, url=query.value("url"))
+        return chapter.source.get_page(page), page
+
+    def read_page(
+        self, response: Response, source: Source, page: SourcePage
+    ) -> bytes | None:
         error = response.error()
         if error != Response.Error.NoError:
             if error != Response.Error.OperationCanceledError:
                 source.page_request_error(response, page)
-            return HttpResponse(StatusCode.INTERNAL_SERVER_ERROR)
+            return None
+        return to_bytes(source.parse_page(response, page))
 
-        data = (
-            source.parse_page(response, page)
-            if not response.url().isLocalFile()
-            else response.read_all()
-        )
-
-        image = QImage()
-        if not image.loadFromData(data):
+    def _page_image_received(
+        self,
+        request: HttpRequest,
+        response: Response,
+        chapter: Chapter,
+        page: SourcePage,
+        index: int,
+        variant: ImageVariant,
+    ):
+        data = self.read_page(response, chapter.source, page)
+        if data is None:
+            self.page_failed(response, chapter.id)
             return HttpResponse(StatusCode.INTERNAL_SERVER_ERROR)
-        image = image.scaledToWidth(720, Qt.TransformationMode.SmoothTransformation)
 
-        buffer = QBuffer(response)
-        buffer.open(QBuffer.OpenModeFlag.ReadWrite)
-        if not image.save(buffer, "JPG"):
-            return HttpResponse(StatusCode.INTERNAL_SERVER_ERROR)
+        if variant.original:
+            self.page_cache.put(chapter.id, index, variant.params, data)
+            return HttpResponse(headers=variant.headers(data), body=data)
 
-        data = buffer.data()
+        # Decoding and scaling a full size page takes long enough to stall every
+        # other connection, so it is done off the event loop
+        task = self.workers.create(render_image, data, variant)
+        server_response = AsyncHttpResponse(
+            request, self._page_rendered, variant, (chapter.id, index)
+        )
+        task.finished.connect(server_response.wait_for_signal)
+        task.error_occured.connect(server_response.error_occured)
+        task.start()
+        return server_response
 
-        headers = {
-            header.data().decode(): value.data().decode()
-            for (header, value) in response.headers.toListOfPairs()
-        }
-        headers["content-type"] = "image/jpeg"
-        headers["content-length"] = len(data)
+    def _page_rendered(
+        self,
+        _,
+        __,
+        data: bytes | None,
+        variant: ImageVariant,
+        page: tuple[int, int] | None = None,
+    ):
+        if data is None:
+            return HttpResponse(StatusCode.INTERNAL_SERVER_ERROR)
 
-        return HttpResponse(headers=headers, body=data)
+        # Pages handed over by the prefetcher are already cached
+        if page is not None:
+            self.page_cache.put(*page, variant.params, data)
+        return HttpResponse(headers=variant.headers(data), body=data)
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from functools import cache
+
+from PyQt6.QtCore import QBuffer, QByteArray, Qt
+from PyQt6.QtGui import QImage, QImageWriter
+
+from qhttpserver import HttpRequest
+
+# Only these are ever rendered, so each page has a handful of variants at most
+WIDTHS = (360, 540, 720, 1080, 1440)
+QUALITIES = (50, 75, 90)
+FORMATS = {"jpeg": ("JPG", "image/jpeg"), "webp": ("WEBP", "image/webp")}
+ORIGINAL = "original"
+
+PAGE_WIDTH = 720
+PAGE_QUALITY = 75
+PAGE_FORMAT = "jpeg"
+
+MAGIC_NUMBERS = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF8", "image/gif"),
+    (b"RIFF", "image/webp"),
+    (b"BM", "image/bmp"),
+)
+
+
+@cache
+def can_write(format: str) -> bool:
+    return format.lower().encode() in (
+        name.data().lower() for name in QImageWriter.supportedImageFormats()
+    )
+
+
+def _closest(values: tuple[int, ...], value: int) -> int:
+    return min(values, key=lambda allowed: (abs(allowed - value), -allowed))
+
+
+def sniff_content_type(data: bytes) -> str:
+    for magic, content_type in MAGIC_NUMBERS:
+        if data.startswith(magic):
+            return content_type
+    return "application/octet-stream"
+
+
+def sniff_file(path: str) -> str | None:
+    try:
+        with open(path, "rb") as f:
+            return sniff_content_type(f.read(16))
+    except OSError:
+        return None
+
+
+def to_bytes(data: bytes | QByteArray) -> bytes:
+    return data.data() if isinstance(data, QByteArray) else bytes(data)
+
+
+class ImageVariant:
+    def __init__(
+        self,
+        width: int = PAGE_WIDTH,
+        quality: int = PAGE_QUALITY,
+        format: str = PAGE_FORMAT,
+    ) -> None:
+        self.width = width
+        self.quality = quality
+        self.format = format
+
+    @property
+    def original(self) -> bool:
+        return self.format == ORIGINAL
+
+    @property
+    def params(self) -> str:
+        # Part of the page cache key, anything that changes the output belongs here
+        if self.original:
+            return ORIGINAL
+        return f"width={self.width};quality={self.quality};format={self.format}"
+
+    @property
+    def content_type(self) -> str | None:
+        return None if self.original else FORMATS[self.format][1]
+
+    @classmethod
+    def from_request(
+        cls, request: HttpRequest, width: int = PAGE_WIDTH
+    ) -> ImageVariant | None:
+        # Anything asked for is snapped to the closest allowed variant, None is
+        # returned for values that aren't understood at all
+        params = request.query_params
+
+        try:
+            if "width" in params:
+                width = _closest(WIDTHS, int(params["width"][0]))
+            quality = PAGE_QUALITY
+            if "quality" in params:
+                quality = _closest(QUALITIES, int(params["quality"][0]))
+        except ValueError:
+            return None
+
+        # Only an explicit format changes the output, browsers list image/webp
+        # in Accept for every <img> and would all be switched over otherwise
+        format = params.get("format", [PAGE_FORMAT])[0].lower()
+        if format == "jpg":
+            format = "jpeg"
+        if format != ORIGINAL and format not in FORMATS:
+            return None
+        if format in FORMATS and not can_write(FORMATS[format][0]):
+            format = PAGE_FORMAT
+
+        return cls(width, quality, format)
+
+    def headers(self, data: bytes) -> dict[str, str]:
+        return {"Content-Type": self.content_type or sniff_content_type(data)}
+
+
+def render_image(data: bytes, variant: ImageVariant) -> bytes | None:
+    # Runs on a worker thread so it must only use objects it creates itself
+    image = QImage()
+    if not image.loadFromData(data):
+        return None
+    if image.width() > variant.width:
+        image = image.scaledToWidth(
+            variant.width, Qt.TransformationMode.SmoothTransformation
+        )
+
+    buffer = QBuffer()
+    buffer.open(QBuffer.OpenModeFlag.WriteOnly)
+    if not image.save(buffer, FORMATS[variant.format][0], variant.quality):
+        return None
+    return buffer.data().data()
+
+
+def render_file(path: str, variant: ImageVariant) -> bytes | None:
+    # Pages of downloaded chapters are read straight off the disk, also on a
+    # worker thread
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    return data if variant.original else render_image(data, variant)
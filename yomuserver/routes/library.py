@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from functools import partial
 from typing import TYPE_CHECKING
 
 from qhttpserver import (
@@ -12,29 +13,44 @@ from qhttpserver import (
     delete,
 )
 
+from ..versions import LIBRARY
+from .listing import ListQuery, MANGA_FIELDS, MANGA_SORT_FIELDS
 from .utils import convert_manga_to_json
 
 if TYPE_CHECKING:
     from yomu.core.sql import Sql
 
+    from ..cache import ModelCache
+    from ..versions import Versions
+
 
 class LibraryHandler(RouteHandler):
     BASE_PATH = "/api/library"
 
-    def __init__(self, sql: Sql):
+    def __init__(self, sql: Sql, models: ModelCache, versions: Versions):
         super().__init__()
         self.sql = sql
+        self.models = models
+        self.versions = versions
 
     @get("/")
     def get_library(self, request: HttpRequest):
+        query = ListQuery.from_request(request, MANGA_FIELDS, MANGA_SORT_FIELDS)
+        if query is None:
+            return HttpResponse(status=StatusCode.BAD_REQUEST)
+        return self.versions.response(
+            request, (LIBRARY,), partial(self._library_response, query)
+        )
+
+    def _library_response(self, query: ListQuery):
         mangas = self.sql.get_library()
-        return HttpResponse(json=list(map(convert_manga_to_json, mangas)))
+        return query.response(mangas, convert_manga_to_json)
 
     @post("/<id:int>/")
     def add_manga_to_library(self, request: HttpRequest):
         manga_id = request.path_params["id"]
 
-        manga = self.sql.get_manga_by_id(manga_id)
+        manga = self.models.get_manga(manga_id)
         if manga is None:
             return HttpResponse(StatusCode.NOT_FOUND)
 
@@ -46,7 +62,7 @@ class LibraryHandler(RouteHandler):
     def remove_manga_from_library(self, request: HttpRequest):
         manga_id = request.path_params["id"]
 
-        manga = self.sql.get_manga_by_id(manga_id)
+        manga = self.models.get_manga(manga_id)
         if manga is None:
             return HttpResponse(StatusCode.NOT_FOUND)
 
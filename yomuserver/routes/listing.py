@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Sequence
+
+from qhttpserver import HttpRequest, HttpResponse
+
+MAX_LIMIT = 1000
+
+MANGA_FIELDS = (
+    "id",
+    "source",
+    "title",
+    "description",
+    "author",
+    "artist",
+    "thumbnail",
+    "library",
+    "initialized",
+    "url",
+)
+# Sort fields are read straight off the models so only the requested slice ever
+# gets converted to json
+MANGA_SORT_FIELDS = ("id", "title", "author", "artist")
+
+CHAPTER_FIELDS = (
+    "id",
+    "number",
+    "manga",
+    "title",
+    "uploaded",
+    "downloaded",
+    "read",
+    "url",
+)
+CHAPTER_SORT_FIELDS = ("id", "number", "title", "uploaded")
+
+
+def _sort_key(field: str):
+    def key(item: Any) -> tuple[bool, Any]:
+        value = getattr(item, field)
+        if isinstance(value, str):
+            value = value.casefold()
+        # Missing values always go last
+        return value is None, value if value is not None else 0
+
+    return key
+
+
+class ListQuery:
+    # `?limit=&offset=&sort=[-]field&fields=a,b` for the larger listings. With
+    # none of them the listing is returned as it always was
+
+    def __init__(
+        self,
+        limit: int | None = None,
+        offset: int = 0,
+        sort: str | None = None,
+        descending: bool = False,
+        fields: tuple[str, ...] | None = None,
+    ) -> None:
+        self.limit = limit
+        self.offset = offset
+        self.sort = sort
+        self.descending = descending
+        self.fields = fields
+
+    @classmethod
+    def from_request(
+        cls,
+        request: HttpRequest,
+        fields: tuple[str, ...],
+        sort_fields: tuple[str, ...],
+        default_sort: str | None = None,
+    ) -> ListQuery | None:
+        params = request.query_params
+
+        try:
+            limit = int(params["limit"][0]) if "limit" in params else None
+            offset = int(params.get("offset", ["0"])[0])
+        except ValueError:
+            return None
+        if offset < 0 or (limit is not None and not 0 <= limit <= MAX_LIMIT):
+            return None
+
+        sort, descending = params.get("sort", [default_sort])[0], False
+        if sort is not None:
+            if sort.startswith("-"):
+                sort, descending = sort[1:], True
+            if sort not in sort_fields:
+                return None
+
+        selected = None
+        if "fields" in params:
+            selected = tuple(
+                field
+                for value in params["fields"]
+                for field in value.split(",")
+                if field
+            )
+            if any(field not in fields for field in selected):
+                return None
+            if "id" not in selected:
+                selected = ("id", *selected)
+
+        return cls(limit, offset, sort, descending, selected)
+
+    @property
+    def paginated(self) -> bool:
+        return self.limit is not None or self.offset > 0
+
+    def apply(self, items: Sequence, convert: Callable[[Any], dict]) -> list[dict]:
+        if self.sort is not None:
+            items = sorted(items, key=_sort_key(self.sort), reverse=self.descending)
+
+        if self.paginated:
+            end = None if self.limit is None else self.offset + self.limit
+            items = items[self.offset : end]
+
+        if self.fields is None:
+            return list(map(convert, items))
+
+        fields = self.fields
+        return [
+            {field: value[field] for field in fields} for value in map(convert, items)
+        ]
+
+    def response(self, items: Sequence, convert: Callable[[Any], dict]) -> HttpResponse:
+        return HttpResponse(
+            headers={"X-Total-Count": str(len(items))},
+            json=self.apply(items, convert),
+        )
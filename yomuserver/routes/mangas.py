@@ -1,11 +1,9 @@
 from __future__ import annotations
 
 import os
+from functools import partial
 from typing import TYPE_CHECKING
 
-from PyQt6.QtCore import QBuffer, Qt, QUrl
-from PyQt6.QtGui import QImage
-
 from yomu.core.network import Request, Response
 from qhttpserver import (
     get,
@@ -14,10 +12,16 @@ from qhttpserver import (
     HttpResponse,
     HttpRequest,
     RouteHandler,
+    SingleFlight,
     StatusCode,
+    WorkerPool,
+    file_response,
 )
 
-from .utils import convert_manga_to_json, convert_chapter_to_json
+from ..versions import chapters_scope
+from .images import render_file, render_image, sniff_file, to_bytes, ImageVariant
+from .listing import ListQuery, CHAPTER_FIELDS, CHAPTER_SORT_FIELDS
+from .utils import convert_chapter_to_json
 
 if TYPE_CHECKING:
     from yomu.core.models import Manga
@@ -26,48 +30,72 @@ if TYPE_CHECKING:
     from yomu.core.sql import Sql
     from yomu.core.updater import Updater
 
+    from ..cache import ModelCache
+    from ..versions import Versions
+
 
 class MangaHandler(RouteHandler):
     BASE_PATH = "/api/manga"
 
     def __init__(
-        self, network: Network, downloader: Downloader, sql: Sql, updater: Updater
+        self,
+        network: Network,
+        downloader: Downloader,
+        sql: Sql,
+        models: ModelCache,
+        updater: Updater,
+        workers: WorkerPool,
+        flights: SingleFlight,
+        versions: Versions,
     ) -> None:
         super().__init__()
         self.network = network
         self.downloader = downloader
         self.sql = sql
+        self.models = models
         self.updater = updater
+        self.workers = workers
+        self.flights = flights
+        self.versions = versions
 
     @get("/<id:int>")
     def get_manga(self, request: HttpRequest):
         manga_id = request.path_params["id"]
 
-        manga = self.sql.get_manga_by_id(manga_id)
+        manga = self.models.get_manga(manga_id)
         if manga is None:
             return HttpResponse(status=StatusCode.NOT_FOUND)
 
-        return HttpResponse(json=convert_manga_to_json(manga))
+        return HttpResponse(json=self.models.manga_json(manga))
 
     @get("/<id:int>/chapters")
     def get_chapters(self, request: HttpRequest):
-        manga_id = request.path_params["id"]
+        query = ListQuery.from_request(
+            request, CHAPTER_FIELDS, CHAPTER_SORT_FIELDS, default_sort="number"
+        )
+        if query is None:
+            return HttpResponse(status=StatusCode.BAD_REQUEST)
 
-        manga = self.sql.get_manga_by_id(manga_id)
+        manga = self.models.get_manga(request.path_params["id"])
         if manga is None:
             return HttpResponse(status=StatusCode.NOT_FOUND)
 
         chapters = self.sql.get_chapters(manga)
-        return HttpResponse(
-            json=sorted(
-                map(lambda chapter: convert_chapter_to_json(chapter), chapters),
-                key=lambda chapter: chapter["number"],
-            )
+        # Chapters finish or lose their downloads without a signal, so the tag
+        # has to look at that itself
+        downloaded = ",".join(
+            str(chapter.id) for chapter in chapters if chapter.downloaded
+        )
+        return self.versions.response(
+            request,
+            (chapters_scope(manga.id),),
+            partial(query.response, chapters, convert_chapter_to_json),
+            downloaded,
         )
 
     @post("/<id:int>/update")
     def update_manga(self, request: HttpRequest):
-        manga = self.sql.get_manga_by_id(request.path_params["id"])
+        manga = self.models.get_manga(request.path_params["id"])
         if manga is None:
             return HttpResponse(status=StatusCode.NOT_FOUND)
 
@@ -81,49 +109,72 @@ class MangaHandler(RouteHandler):
 
     @get("/<id:int>/thumbnail")
     def load_thumbnail(self, request: HttpRequest):
-        manga = self.sql.get_manga_by_id(request.path_params["id"])
+        manga = self.models.get_manga(request.path_params["id"])
         if manga is None:
             return HttpResponse(status=StatusCode.NOT_FOUND)
 
-        path = self.downloader.resolve_path(manga)
-        r: Request = (
-            Request(QUrl.fromLocalFile(os.path.join(path, "thumbnail.png")))
-            if manga.library and os.path.exists(path)
-            else manga.get_thumbnail()
+        variant = ImageVariant.from_request(request)
+        if variant is None:
+            return HttpResponse(status=StatusCode.BAD_REQUEST)
+
+        return self.flights.do(
+            request,
+            ("thumbnail", manga.id, variant.params),
+            partial(self._load_thumbnail, request, manga, variant),
         )
+
+    def _load_thumbnail(
+        self, request: HttpRequest, manga: Manga, variant: ImageVariant
+    ):
+        path = os.path.join(self.downloader.resolve_path(manga), "thumbnail.png")
+        if manga.library and os.path.exists(path):
+            if variant.original:
+                return file_response(request, path, sniff_file(path))
+
+            task = self.workers.create(render_file, path, variant)
+            server_response = AsyncHttpResponse(
+                request, self._thumbnail_rendered, variant
+            )
+            task.finished.connect(server_response.wait_for_signal)
+            task.error_occured.connect(server_response.error_occured)
+            task.start()
+            return server_response
+
+        r = manga.get_thumbnail()
         r.setPriority(Request.Priority.LowPriority)
         response = self.network.handle_request(r)
 
-        server_response = AsyncHttpResponse(request, self._thumbnail_received, manga)
+        server_response = AsyncHttpResponse(
+            request, self._thumbnail_received, manga, variant
+        )
         response.finished.connect(server_response.wait_for_signal)
         return server_response
 
-    def _thumbnail_received(self, _, reply: Response, manga: Manga):
+    def _thumbnail_received(
+        self,
+        request: HttpRequest,
+        reply: Response,
+        manga: Manga,
+        variant: ImageVariant,
+    ):
         error = reply.error()
         if error != Response.Error.NoError:
             if error != Response.Error.OperationCanceledError:
                 manga.source.thumbnail_request_error(reply)
             return HttpResponse(StatusCode.INTERNAL_SERVER_ERROR)
 
-        data = manga.source.parse_thumbnail(reply, manga)
+        data = to_bytes(manga.source.parse_thumbnail(reply, manga))
+        if variant.original:
+            return HttpResponse(headers=variant.headers(data), body=data)
 
-        image = QImage()
-        if not image.loadFromData(data):
-            return HttpResponse(StatusCode.INTERNAL_SERVER_ERROR)
-        image = image.scaledToWidth(720, Qt.TransformationMode.SmoothTransformation)
+        task = self.workers.create(render_image, data, variant)
+        server_response = AsyncHttpResponse(request, self._thumbnail_rendered, variant)
+        task.finished.connect(server_response.wait_for_signal)
+        task.error_occured.connect(server_response.error_occured)
+        task.start()
+        return server_response
 
-        buffer = QBuffer(reply)
-        buffer.open(QBuffer.OpenModeFlag.WriteOnly)
-        if not image.save(buffer, "JPG"):
+    def _thumbnail_rendered(self, _, __, data: bytes | None, variant: ImageVariant):
+        if data is None:
             return HttpResponse(StatusCode.INTERNAL_SERVER_ERROR)
-
-        data = buffer.data()
-
-        headers = {
-            header.data().decode(): value.data().decode()
-            for (header, value) in reply.headers.toListOfPairs()
-        }
-        headers["content-type"] = "image/jpeg"
-        headers["content-length"] = len(data)
-
-        return HttpResponse(headers=headers, body=data)
+        return HttpResponse(headers=variant.headers(data), body=data)
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from functools import partial
+from typing import TYPE_CHECKING
+import os
+import re
+
+from PyQt6.QtCore import pyqtSignal, QObject
+
+from yomu.core.downloader import Downloader
+from qhttpserver import WorkerPool
+
+if TYPE_CHECKING:
+    from yomu.core.models import Chapter
+
+PAGE_FILE = re.compile(r"(\d+)\.png")
+
+
+class PageFile:
+    def __init__(self, path: str, size: int, mtime: float) -> None:
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+
+
+class ChapterManifest:
+    def __init__(self, path: str, mtime_ns: int, pages: dict[int, PageFile]) -> None:
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.pages = pages
+
+    @property
+    def page_count(self) -> int:
+        return len(self.pages)
+
+    @classmethod
+    def scan(cls, path: str, mtime_ns: int) -> ChapterManifest | None:
+        # Runs on a worker thread, only the directory is listed and nothing
+        # inside the pages themselves is read
+        pages = {}
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if (m := PAGE_FILE.fullmatch(entry.name)) is None:
+                        continue
+
+                    stat = entry.stat()
+                    pages[int(m.group(1))] = PageFile(
+                        entry.path, stat.st_size, stat.st_mtime
+                    )
+        except OSError:
+            return None
+        return cls(path, mtime_ns, pages)
+
+
+class ManifestScan(QObject):
+    # Lives on the main thread and re-emits what the worker scanning the chapter
+    # found, so whatever connects to it while the scan runs never misses it
+    finished = pyqtSignal(object)
+    error_occured = pyqtSignal(Exception)
+
+    def __init__(self, parent: QObject) -> None:
+        super().__init__(parent)
+        self.finished.connect(self.deleteLater)
+        self.error_occured.connect(self.deleteLater)
+
+
+class ManifestCache(QObject):
+    # The pages of downloaded chapters, scanned once and trusted for as long as
+    # the chapter's directory keeps the same mtime, which changes whenever a
+    # page is added, removed or renamed. Scans run on the worker pool, the
+    # requests that need one wait on the same scan
+
+    def __init__(
+        self, workers: WorkerPool, max_entries: int = 128, parent: QObject | None = None
+    ) -> None:
+        super().__init__(parent)
+        self.workers = workers
+        self.max_entries = max_entries
+        self.hits = 0
+        self.scans = 0
+
+        self._manifests: OrderedDict[int, ChapterManifest] = OrderedDict()
+        self._scanning: dict[int, ManifestScan] = {}
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._manifests),
+            "hits": self.hits,
+            "scans": self.scans,
+            "scanning": len(self._scanning),
+        }
+
+    def get(self, chapter: Chapter) -> ChapterManifest | ManifestScan | None:
+        # None when the chapter has no directory. A chapter that has to be
+        # scanned first gets the scan, which emits the manifest or None
+        path = Downloader.resolve_path(chapter)
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            self._manifests.pop(chapter.id, None)
+            return None
+
+        manifest = self._manifests.get(chapter.id)
+        if (
+            manifest is not None
+            and manifest.path == path
+            and manifest.mtime_ns == mtime_ns
+        ):
+            self._manifests.move_to_end(chapter.id)
+            self.hits += 1
+            return manifest
+
+        if (scan := self._scanning.get(chapter.id)) is not None:
+            return scan
+
+        self.scans += 1
+        scan = self._scanning[chapter.id] = ManifestScan(self)
+        # Connected before anyone else can, so the manifest is stored by the
+        # time whoever waits on the scan looks for it
+        scan.finished.connect(partial(self._scanned, chapter.id))
+        scan.error_occured.connect(partial(self._scan_failed, chapter.id))
+
+        task = self.workers.create(ChapterManifest.scan, path, mtime_ns)
+        task.finished.connect(scan.finished)
+        task.error_occured.connect(scan.error_occured)
+        task.start()
+        return scan
+
+    def _scanned(self, chapter_id: int, manifest: ChapterManifest | None) -> None:
+        self._scanning.pop(chapter_id, None)
+        if manifest is None:
+            self._manifests.pop(chapter_id, None)
+            return
+
+        self._manifests[chapter_id] = manifest
+        self._manifests.move_to_end(chapter_id)
+        while len(self._manifests) > self.max_entries:
+            self._manifests.popitem(last=False)
+
+    def _scan_failed(self, chapter_id: int, _: Exception) -> None:
+        self._scanning.pop(chapter_id, None)
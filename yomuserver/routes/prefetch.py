@@ -0,0 +1,289 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from functools import partial
+from logging import getLogger
+from typing import TYPE_CHECKING
+
+from PyQt6.QtCore import pyqtSignal, QObject
+
+from yomu.core.network import Request, Response
+
+from .images import render_file, render_image, ImageVariant
+from .manifest import ChapterManifest, ManifestScan
+
+if TYPE_CHECKING:
+    from yomu.core.models import Chapter
+    from yomu.source import Source
+    from yomu.source.models import Page as SourcePage
+
+    from .chapters import ChapterHandler
+
+# Readers further back than this have their prefetches cancelled
+MAX_CHAPTERS = 4
+MAX_REMEMBERED = 1024
+
+logger = getLogger(__name__)
+
+
+class PrefetchJob(QObject):
+    finished = pyqtSignal(object)
+
+    def __init__(self, parent: QObject) -> None:
+        super().__init__(parent)
+        self.reply: Response | None = None
+        # A request for the page came in while it was still being prefetched
+        self.waiting = False
+
+
+class PagePrefetcher(QObject):
+    # Renders the pages after the one being read into the page cache so that
+    # turning the page doesn't have to wait on the source
+
+    def __init__(self, handler: ChapterHandler, depth: int) -> None:
+        super().__init__()
+        self.handler = handler
+        self.depth = depth
+
+        self._jobs: dict[tuple[int, int, str], PrefetchJob] = {}
+        self._chapters: OrderedDict[int, None] = OrderedDict()
+        self._prefetched: OrderedDict[tuple[int, int, str], None] = OrderedDict()
+        self._warmed: OrderedDict[int, None] = OrderedDict()
+
+        self.scheduled = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.used = 0
+        self.warmups = 0
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "in_flight": len(self._jobs),
+            "scheduled": self.scheduled,
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+            "used": self.used,
+            "warmups": self.warmups,
+            "hit_rate": self.used / self.completed if self.completed else 0.0,
+        }
+
+    def job(self, chapter_id: int, index: int, params: str) -> PrefetchJob | None:
+        job = self._jobs.get((chapter_id, index, params))
+        if job is not None:
+            job.waiting = True
+        return job
+
+    def page_served(self, chapter_id: int, index: int, params: str) -> None:
+        # The only place a prefetch counts as used, each one at most once
+        key = (chapter_id, index, params)
+        if key in self._prefetched:
+            del self._prefetched[key]
+            self.used += 1
+
+    def prefetch(self, chapter: Chapter, index: int, variant: ImageVariant) -> None:
+        if self.depth <= 0:
+            return
+
+        self._track(chapter.id)
+
+        # The reader jumped, whatever was queued outside the new window is wasted
+        last = index + self.depth
+        for key in list(self._jobs):
+            if key[0] == chapter.id and not index <= key[1] <= last:
+                self._cancel(key)
+
+        if not self._fill(chapter, index + 1, last, variant):
+            # The window runs past the last page
+            self._warm_up(chapter, variant)
+
+    def _track(self, chapter_id: int) -> None:
+        self._chapters[chapter_id] = None
+        self._chapters.move_to_end(chapter_id)
+        while len(self._chapters) > MAX_CHAPTERS:
+            self._cancel_chapter(self._chapters.popitem(last=False)[0])
+
+    def _fill(
+        self, chapter: Chapter, first: int, last: int, variant: ImageVariant
+    ) -> bool:
+        for i in range(first, last + 1):
+            key = (chapter.id, i, variant.params)
+            if key in self._jobs or self.handler.page_cache.contains(*key):
+                continue
+            if not self._start(chapter, i, variant):
+                return False
+        return True
+
+    def _warm_up(self, chapter: Chapter, variant: ImageVariant) -> None:
+        if chapter.id in self._warmed:
+            return
+        self._warmed[chapter.id] = None
+        while len(self._warmed) > MAX_REMEMBERED:
+            self._warmed.popitem(last=False)
+
+        next_chapter = min(
+            (
+                other
+                for other in self.handler.sql.get_chapters(chapter.manga)
+                if other.number > chapter.number
+            ),
+            key=lambda other: other.number,
+            default=None,
+        )
+        if next_chapter is None:
+            return
+
+        self.warmups += 1
+        self._track(next_chapter.id)
+        if (
+            next_chapter.downloaded
+            or self.handler.stored_page_count(next_chapter) is not None
+        ):
+            self._fill(next_chapter, 0, self.depth - 1, variant)
+            return
+
+        r = next_chapter.source.get_chapter_pages(next_chapter)
+        r.setPriority(Request.Priority.LowPriority)
+        reply = self.handler.network.handle_request(r)
+        reply.finished.connect(
+            partial(self._page_list_received, reply, next_chapter, variant)
+        )
+
+    def _page_list_received(
+        self, reply: Response, chapter: Chapter, variant: ImageVariant
+    ) -> None:
+        if reply.error() != Response.Error.NoError:
+            return
+
+        try:
+            page_count = self.handler.store_pages(reply, chapter)
+        except Exception:
+            self.failed += 1
+            logger.exception(f"Failed to parse the page list of chapter {chapter.id}")
+            return
+        if page_count is None:
+            return
+
+        # The reader may have moved on while the list was being fetched
+        if chapter.id in self._chapters:
+            self._fill(chapter, 0, self.depth - 1, variant)
+
+    def _start(self, chapter: Chapter, index: int, variant: ImageVariant) -> bool:
+        if chapter.downloaded:
+            return self._start_local(chapter, index, variant)
+
+        page_request = self.handler.page_request(chapter, index)
+        if page_request is None:
+            # Past the last page
+            return False
+
+        r, page = page_request
+        r.setPriority(Request.Priority.LowPriority)
+
+        key = (chapter.id, index, variant.params)
+        job = self._jobs[key] = PrefetchJob(self)
+        job.reply = self.handler.network.handle_request(r)
+        job.reply.finished.connect(
+            partial(self._page_received, key, job, chapter.source, page, variant)
+        )
+        self.scheduled += 1
+        return True
+
+    def _start_local(self, chapter: Chapter, index: int, variant: ImageVariant) -> bool:
+        manifest = self.handler.manifests.get(chapter)
+        if isinstance(manifest, ManifestScan):
+            # Picked up again once the chapter's pages are known
+            manifest.finished.connect(
+                partial(self._manifest_scanned, chapter, index, variant)
+            )
+            return True
+
+        page = manifest.pages.get(index) if manifest is not None else None
+        if page is None:
+            return False
+        if variant.original:
+            # Nothing to get ready, the file is read as is when it's asked for
+            return True
+
+        key = (chapter.id, index, variant.params)
+        job = self._jobs[key] = PrefetchJob(self)
+        task = self.handler.workers.create(render_file, page.path, variant)
+        task.finished.connect(partial(self._finish, key, job))
+        task.error_occured.connect(lambda _: self._finish(key, job, None))
+        task.start()
+        self.scheduled += 1
+        return True
+
+    def _manifest_scanned(
+        self,
+        chapter: Chapter,
+        index: int,
+        variant: ImageVariant,
+        manifest: ChapterManifest | None,
+    ) -> None:
+        # The reader may have moved on while the chapter was being scanned
+        if manifest is not None and chapter.id in self._chapters:
+            self._fill(chapter, index, index, variant)
+
+    def _page_received(
+        self,
+        key: tuple[int, int, str],
+        job: PrefetchJob,
+        source: Source,
+        page: SourcePage,
+        variant: ImageVariant,
+    ) -> None:
+        if self._jobs.get(key) is not job:
+            return
+
+        reply, job.reply = job.reply, None
+        data = self.handler.read_page(reply, source, page)
+        if data is None:
+            self.handler.page_failed(reply, key[0])
+            return self._finish(key, job, None)
+        if variant.original:
+            return self._finish(key, job, data)
+
+        task = self.handler.workers.create(render_image, data, variant)
+        task.finished.connect(partial(self._finish, key, job))
+        task.error_occured.connect(lambda _: self._finish(key, job, None))
+        task.start()
+
+    def _finish(
+        self,
+        key: tuple[int, int, str],
+        job: PrefetchJob,
+        data: bytes | None,
+    ) -> None:
+        if self._jobs.get(key) is job:
+            del self._jobs[key]
+
+        if data is None:
+            self.failed += 1
+        else:
+            self.completed += 1
+            self.handler.page_cache.put(*key, data)
+            self._prefetched[key] = None
+            while len(self._prefetched) > MAX_REMEMBERED:
+                self._prefetched.popitem(last=False)
+
+        job.finished.emit(data)
+        job.deleteLater()
+
+    def _cancel(self, key: tuple[int, int, str]) -> None:
+        job = self._jobs[key]
+        if job.waiting or job.reply is None:
+            # Either someone is waiting on it or it is already being rendered
+            return
+
+        del self._jobs[key]
+        self.cancelled += 1
+        job.reply.abort()
+        job.deleteLater()
+
+    def _cancel_chapter(self, chapter_id: int) -> None:
+        for key in list(self._jobs):
+            if key[0] == chapter_id:
+                self._cancel(key)
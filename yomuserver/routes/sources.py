@@ -1,8 +1,11 @@
 from __future__ import annotations
 
 import inspect
+import json
 import os
-from typing import TYPE_CHECKING
+from functools import partial
+from logging import getLogger
+from typing import Any, Callable, TYPE_CHECKING
 
 from yomu.core.network import Request, Response
 from yomu.source import Source
@@ -13,9 +16,11 @@ from qhttpserver import (
     HttpResponse,
     HttpRequest,
     RouteHandler,
+    SingleFlight,
     StatusCode,
 )
 
+from ..versions import SOURCES
 from .utils import convert_manga_to_json, convert_source_to_json
 
 if TYPE_CHECKING:
@@ -23,20 +28,45 @@ if TYPE_CHECKING:
     from yomu.core.network import Network
     from yomu.core.sql import Sql
 
+    from ..cache import StaleCache
+    from ..versions import Versions
+
+
+logger = getLogger(__name__)
+
 
 class SourceHandler(RouteHandler):
     BASE_PATH = "/api/sources"
 
-    def __init__(self, network: Network, source_manager: SourceManager, sql: Sql):
+    def __init__(
+        self,
+        network: Network,
+        source_manager: SourceManager,
+        sql: Sql,
+        flights: SingleFlight,
+        manga_lists: StaleCache,
+        versions: Versions,
+        prefetch_next: bool = True,
+    ):
         super().__init__()
         self.network = network
         self.source_manager = source_manager
         self.sql = sql
+        self.flights = flights
+        self.manga_lists = manga_lists
+        self.versions = versions
+        self.prefetch_next = prefetch_next
+        self._background: set[tuple] = set()
 
     @get("/")
     def get_sources(self, request: HttpRequest):
-        return HttpResponse(
-            json=list(map(convert_source_to_json, self.source_manager.sources))
+        sources = self.source_manager.sources
+        return self.versions.response(
+            request,
+            (SOURCES,),
+            lambda: HttpResponse(json=list(map(convert_source_to_json, sources))),
+            # Sources can come and go without a signal
+            ",".join(str(source.id) for source in sources),
         )
 
     @get("/<id:int>/icon")
@@ -64,17 +94,34 @@ class SourceHandler(RouteHandler):
             return HttpResponse(status=StatusCode.NOT_FOUND)
 
         page = params["page"]
+        key = ("latest", source.id, page, self._filters_key(source))
+        manga_list = self._cached_manga_list(
+            key,
+            partial(source.get_latest, page),
+            lambda reply: source.parse_latest(reply, page),
+        )
+        if manga_list is not None:
+            self._prefetch_latest(source, page, manga_list)
+            return self._manga_list_response(source, manga_list)
+
+        return self.flights.do(
+            request, key, partial(self._load_latest, request, source, page, key)
+        )
+
+    def _load_latest(self, request: HttpRequest, source: Source, page: int, key: tuple):
         r = source.get_latest(page)
         r.setPriority(Request.Priority.HighPriority)
         response = self.network.handle_request(r)
 
         server_response = AsyncHttpResponse(
-            request, self._latest_mangas_received, source, page
+            request, self._latest_mangas_received, source, page, key
         )
         response.finished.connect(server_response.wait_for_signal)
         return server_response
 
-    def _latest_mangas_received(self, _, reply: Response, source: Source, page: int):
+    def _latest_mangas_received(
+        self, _, reply: Response, source: Source, page: int, key: tuple
+    ):
         error = reply.error()
         if error != Response.Error.NoError:
             if error != Response.Error.OperationCanceledError:
@@ -82,13 +129,22 @@ class SourceHandler(RouteHandler):
             return HttpResponse(StatusCode.INTERNAL_SERVER_ERROR)
 
         manga_list = source.parse_latest(reply, page)
-        mangas = self.sql.add_and_get_mangas(source, manga_list.mangas)
+        self.manga_lists.put(key, manga_list)
+        self._prefetch_latest(source, page, manga_list)
+        return self._manga_list_response(source, manga_list)
 
-        body = {
-            "mangas": list(map(convert_manga_to_json, mangas)),
-            "has_next_page": manga_list.has_next_page,
-        }
-        return HttpResponse(json=body)
+    def _prefetch_latest(self, source: Source, page: int, manga_list) -> None:
+        if not self.prefetch_next or not manga_list.has_next_page:
+            return
+
+        page += 1
+        key = ("latest", source.id, page, self._filters_key(source))
+        if key not in self.manga_lists:
+            self._fetch_in_background(
+                key,
+                partial(source.get_latest, page),
+                lambda reply: source.parse_latest(reply, page),
+            )
 
     @get("/<id:int>/search/<name>/")
     def get_search(self, request: HttpRequest):
@@ -98,17 +154,33 @@ class SourceHandler(RouteHandler):
             return HttpResponse(status=StatusCode.NOT_FOUND)
 
         name = params["name"]
+        key = ("search", source.id, name, self._filters_key(source))
+        manga_list = self._cached_manga_list(
+            key,
+            partial(source.search_for_manga, name),
+            lambda reply: source.parse_search_results(reply, name),
+        )
+        if manga_list is not None:
+            return self._manga_list_response(source, manga_list)
+
+        return self.flights.do(
+            request, key, partial(self._load_search, request, source, name, key)
+        )
+
+    def _load_search(self, request: HttpRequest, source: Source, name: str, key: tuple):
         r = source.search_for_manga(name)
         r.setPriority(Request.Priority.HighPriority)
         reply = self.network.handle_request(r)
 
         response = AsyncHttpResponse(
-            request, self._search_mangas_received, source, name
+            request, self._search_mangas_received, source, name, key
         )
         reply.finished.connect(response.wait_for_signal)
         return response
 
-    def _search_mangas_received(self, _, reply: Response, source: Source, name: str):
+    def _search_mangas_received(
+        self, _, reply: Response, source: Source, name: str, key: tuple
+    ):
         error = reply.error()
         if error != Response.Error.NoError:
             if error != Response.Error.OperationCanceledError:
@@ -116,14 +188,69 @@ class SourceHandler(RouteHandler):
             return HttpResponse(StatusCode.INTERNAL_SERVER_ERROR)
 
         manga_list = source.parse_search_results(reply, name)
-        mangas = self.sql.add_and_get_mangas(source, manga_list.mangas)
+        self.manga_lists.put(key, manga_list)
+        return self._manga_list_response(source, manga_list)
+
+    def _filters_key(self, source: Source) -> str:
+        return json.dumps(source.filters, sort_keys=True, default=str)
+
+    def _cached_manga_list(
+        self,
+        key: tuple,
+        make_request: Callable[[], Request],
+        parse: Callable[[Response], Any],
+    ):
+        if (entry := self.manga_lists.get(key)) is None:
+            return None
+
+        manga_list, fresh = entry
+        if not fresh:
+            # Served as is while a newer one is fetched for the next request
+            self._fetch_in_background(key, make_request, parse)
+        return manga_list
+
+    def _fetch_in_background(
+        self,
+        key: tuple,
+        make_request: Callable[[], Request],
+        parse: Callable[[Response], Any],
+    ) -> None:
+        if key in self._background:
+            return
+        self._background.add(key)
 
+        r = make_request()
+        r.setPriority(Request.Priority.LowPriority)
+        reply = self.network.handle_request(r)
+        reply.finished.connect(
+            partial(self._fetched_in_background, key, reply, parse)
+        )
+
+    def _fetched_in_background(
+        self, key: tuple, reply: Response, parse: Callable[[Response], Any]
+    ) -> None:
+        self._background.discard(key)
+        if reply.error() != Response.Error.NoError:
+            # Whatever is cached keeps being served until it expires
+            logger.warning(f"Background refresh of {key} failed: {reply.error()}")
+            return
+
+        try:
+            self.manga_lists.put(key, parse(reply))
+        except Exception:
+            logger.exception(f"Failed to parse the background refresh of {key}")
+
+    def _manga_list_response(self, source: Source, manga_list):
+        mangas = self.sql.add_and_get_mangas(source, manga_list.mangas)
         body = {
             "mangas": list(map(convert_manga_to_json, mangas)),
             "has_next_page": manga_list.has_next_page,
         }
         return HttpResponse(json=body)
 
+    def source_filters_updated(self, source: Source, _: dict) -> None:
+        self.manga_lists.discard_if(lambda key: key[1] == source.id)
+
     @post("/<id:int>/filters")
     def update_filters(self, request: HttpRequest):
         source = self.source_manager.get_source(request.path_params["id"])
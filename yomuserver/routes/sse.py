@@ -4,7 +4,10 @@ from enum import StrEnum
 from typing import TYPE_CHECKING
 import json
 
-from qhttpserver import SSEResponse
+from PyQt6.QtCore import QObject, QTimer
+
+from qhttpserver import HttpRequest, SSEHub, SSEResponse
+from qhttpserver.sse import REPLAY_SIZE
 
 from . import utils
 
@@ -23,6 +26,7 @@ class MessageType(StrEnum):
 
     CHAPTER_LIST_UPDATE = "CHAPTER_LIST_UPDATE"
     CHAPTER_READ_STATUS_CHANGED = "CHAPTER_READ_STATUS_CHANGED"
+    CHAPTERS_READ_STATUS_CHANGED = "CHAPTERS_READ_STATUS_CHANGED"
 
     CATEGORY_CREATED = "CATEGORY_CREATED"
     CATEGORY_DELETED = "CATEGORY_DELETED"
@@ -30,9 +34,27 @@ class MessageType(StrEnum):
     CATEGORY_MANGA_REMOVED = "CATEGORY_MANGA_REMOVED"
 
 
-class YomuEventHandler(SSEResponse):
-    def __init__(self, app: YomuApp):
-        super().__init__()
+# Streams opened with `?coalesce=1` get one message for a batch of read status
+# changes, the rest keep getting one message per chapter
+PER_CHAPTER = "per_chapter"
+COALESCED = "coalesced"
+
+
+class YomuEventHandler(QObject):
+    # Connected to the app once for every client, each message is encoded once
+    # and the hub writes it to all of the open streams
+    def __init__(self, app: YomuApp, replay_size: int = REPLAY_SIZE):
+        super().__init__(app)
+        self.hub = SSEHub(self, replay_size)
+
+        # Marking a batch of chapters emits a signal per chapter, they're
+        # gathered up and sent once control gets back to the event loop
+        self._read_status_changed: dict[int, bool] = {}
+        self._read_status_timer = QTimer(self)
+        self._read_status_timer.setSingleShot(True)
+        self._read_status_timer.setInterval(0)
+        self._read_status_timer.timeout.connect(self.send_read_status_changes)
+
         app.source_filters_updated.connect(self.handle_source_filters_update)
 
         app.manga_library_status_changed.connect(self.handle_manga_library_status)
@@ -46,6 +68,10 @@ class YomuEventHandler(SSEResponse):
         app.category_manga_added.connect(self.handle_category_manga_added)
         app.category_manga_removed.connect(self.handle_category_manga_removed)
 
+    def subscribe(self, request: HttpRequest) -> SSEResponse:
+        coalesce = request.query_params.get("coalesce", ["0"])[0] in ("1", "true")
+        return self.hub.subscribe(request, COALESCED if coalesce else PER_CHAPTER)
+
     def handle_source_filters_update(self, source: Source, filters: dict) -> None:
         self.send_message(
             MessageType.SOURCE_FILTERS_UPDATED, {"id": source.id, **filters}
@@ -79,7 +105,24 @@ class YomuEventHandler(SSEResponse):
         self.send_message(MessageType.CHAPTER_LIST_UPDATE, {"id": manga.id})
 
     def handle_chapter_read_status_status(self, chapter: Chapter) -> None:
-        self.send_message(MessageType.CHAPTER_READ_STATUS_CHANGED, {"id": chapter.id})
+        self._read_status_changed[chapter.id] = chapter.read
+        self._read_status_timer.start()
+
+    def send_read_status_changes(self) -> None:
+        changed, self._read_status_changed = self._read_status_changed, {}
+        if len(changed) == 1:
+            (id,) = changed
+            self.send_message(MessageType.CHAPTER_READ_STATUS_CHANGED, {"id": id})
+            return
+
+        for id in changed:
+            self.send_message(
+                MessageType.CHAPTER_READ_STATUS_CHANGED, {"id": id}, PER_CHAPTER
+            )
+        chapters = [{"id": id, "read": read} for id, read in changed.items()]
+        self.send_message(
+            MessageType.CHAPTERS_READ_STATUS_CHANGED, {"chapters": chapters}, COALESCED
+        )
 
     def handle_category_created(self, category: Category) -> None:
         self.send_message(
@@ -101,13 +144,10 @@ class YomuEventHandler(SSEResponse):
             {"category_id": category.id, "manga_id": manga.id},
         )
 
-    def send_message(self, message_type: MessageType, data: dict) -> None:
+    def send_message(
+        self, message_type: MessageType, data: dict, group: str | None = None
+    ) -> None:
+        # Published even with nobody listening, the event still has to get an id
+        # and go into the history for clients that come back
         message = json.dumps({"type": message_type, "data": data})
-        self.event_occurred.emit("message", message)
-
-
-def sse(app: YomuApp) -> None:
-    def sse_handler(_):
-        return YomuEventHandler(app)
-
-    return sse_handler
+        self.hub.publish("message", message, group)
@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+from typing import Callable
+
+from qhttpserver import HttpResponse, HttpRequest, RouteHandler, get
+
+
+class StatsHandler(RouteHandler):
+    BASE_PATH = "/api/stats"
+
+    def __init__(self, providers: dict[str, Callable[[], dict]]):
+        super().__init__()
+        self.providers = providers
+
+    @get("/")
+    def get_stats(self, request: HttpRequest):
+        return HttpResponse(
+            json={name: provider() for name, provider in self.providers.items()}
+        )
@@ -1,9 +1,8 @@
 from __future__ import annotations
 
-import mimetypes
 import os
 
-from qhttpserver import HttpResponse, HttpRequest, RouteHandler, StatusCode, get
+from qhttpserver import HttpResponse, HttpRequest, RouteHandler, StaticFiles, get
 
 
 STATIC_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
@@ -12,59 +11,37 @@ STATIC_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static
 class WebPageHandler(RouteHandler):
     BASE_PATH = ""
 
-    def send_html(self) -> HttpResponse:
-        with open(os.path.join(STATIC_FOLDER, "index.html")) as f:
-            html = f.read()
-        return HttpResponse(body=html)
+    def __init__(self) -> None:
+        super().__init__()
+        self.static = StaticFiles(STATIC_FOLDER)
+
+    def send_html(self, request: HttpRequest) -> HttpResponse:
+        return self.static.response(request, "index.html")
 
     @get("/")
     def get_homepage(self, request: HttpRequest):
-        return self.send_html()
+        return self.send_html(request)
 
     @get("/sources")
     def get_sourcelist_page(self, request: HttpRequest):
-        return self.send_html()
+        return self.send_html(request)
 
     @get("/source/<source_id:int>")
     def get_sources_page(self, request: HttpRequest):
-        return self.send_html()
+        return self.send_html(request)
 
     @get("/manga/<manga_id:int>/")
     def get_mangacard_page(self, request: HttpRequest):
-        return self.send_html()
+        return self.send_html(request)
 
     @get("/reader/<chapter_id:int>/")
     def get_reader_page(self, request: HttpRequest):
-        return self.send_html()
+        return self.send_html(request)
 
     @get("/<file>")
     def get_file(self, request: HttpRequest):
-        if (file := request.path_params.get("file")) is None:
-            return HttpResponse(StatusCode.BAD_REQUEST)
-
-        path = os.path.join(STATIC_FOLDER, file)
-
-        try:
-            with open(path, "rb") as f:
-                file_content = f.read()
-        except OSError:
-            return HttpResponse(StatusCode.NOT_FOUND)
-
-        headers = {"content-type": mimetypes.guess_file_type(path)[0]}
-        return HttpResponse(headers=headers, body=file_content)
+        return self.static.response(request, request.path_params["file"])
 
     @get("/assets/<file>")
     def get_asset(self, request: HttpRequest):
-        if (file := request.path_params.get("file")) is None:
-            return HttpResponse(StatusCode.BAD_REQUEST)
-
-        path = os.path.join(STATIC_FOLDER, "assets", file)
-
-        try:
-            with open(path, "rb") as f:
-                file_content = f.read()
-        except OSError:
-            return HttpResponse(StatusCode.NOT_FOUND)
-
-        headers = {"content-type": mimetypes.guess_file_type(path)[0]}
-        return HttpResponse(headers=headers, body=file_content)
+        return self.static.response(request, f"assets/{request.path_params['file']}")
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from hashlib import blake2b
+from typing import Callable, Hashable, TYPE_CHECKING
+import os
+
+from PyQt6.QtCore import QObject
+
+from qhttpserver import HttpRequest, HttpResponse, is_not_modified, not_modified
+
+if TYPE_CHECKING:
+    from yomu.core.app import YomuApp
+    from yomu.core.models import Category, Chapter, Manga
+    from yomu.source import Source
+
+LIBRARY = "library"
+CATEGORIES = "categories"
+CATEGORY_MANGAS = "category_mangas"
+SOURCES = "sources"
+
+
+def chapters_scope(manga_id: int) -> tuple[str, int]:
+    return "chapters", manga_id
+
+
+class Versions(QObject):
+    # Counters bumped by the same app signals the SSE stream forwards. An ETag
+    # built from them changes whenever the data behind a response might have,
+    # so a matching If-None-Match can be answered without looking at the data
+
+    def __init__(self, app: YomuApp) -> None:
+        super().__init__(app)
+        # Restarting the server must not make old tags match again
+        self._epoch = os.urandom(4).hex()
+        self._versions: dict[Hashable, int] = {}
+
+        app.source_filters_updated.connect(self._source_filters_updated)
+
+        app.manga_library_status_changed.connect(self._manga_changed)
+        app.manga_details_updated.connect(self._manga_changed)
+
+        app.chapter_list_updated.connect(self._chapters_changed)
+        app.chapter_read_status_changed.connect(self._chapter_changed)
+
+        app.category_created.connect(self._categories_changed)
+        app.category_deleted.connect(self._categories_changed)
+        app.category_manga_added.connect(self._category_mangas_changed)
+        app.category_manga_removed.connect(self._category_mangas_changed)
+
+    def bump(self, *scopes: Hashable) -> None:
+        for scope in scopes:
+            self._versions[scope] = self._versions.get(scope, 0) + 1
+
+    def etag(self, scopes: tuple[Hashable, ...], extra: str = "") -> str:
+        versions = "-".join(str(self._versions.get(scope, 0)) for scope in scopes)
+        if extra:
+            # For state that changes without a signal but is cheap to look at
+            versions += "-" + blake2b(extra.encode(), digest_size=6).hexdigest()
+        return f'W/"{self._epoch}-{versions}"'
+
+    def response(
+        self,
+        request: HttpRequest,
+        scopes: tuple[Hashable, ...],
+        func: Callable[[], HttpResponse],
+        extra: str = "",
+    ) -> HttpResponse:
+        etag = self.etag(scopes, extra)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if is_not_modified(request, etag):
+            return not_modified(headers)
+
+        response = func()
+        if response.status == 200:
+            response.headers.update(headers)
+        return response
+
+    def _source_filters_updated(self, _: Source, __: dict) -> None:
+        self.bump(SOURCES)
+
+    def _manga_changed(self, manga: Manga) -> None:
+        # Manga details show up in both the library and category lists
+        self.bump(LIBRARY, CATEGORY_MANGAS)
+
+    def _chapters_changed(self, manga: Manga) -> None:
+        self.bump(chapters_scope(manga.id))
+
+    def _chapter_changed(self, chapter: Chapter) -> None:
+        self.bump(chapters_scope(chapter.manga.id))
+
+    def _categories_changed(self, _: Category) -> None:
+        self.bump(CATEGORIES, CATEGORY_MANGAS)
+
+    def _category_mangas_changed(self, _: Category, __: Manga) -> None:
+        self.bump(CATEGORY_MANGAS)